@@ -1,14 +1,36 @@
-from fastapi import FastAPI, HTTPException
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
-from module.script import generate_ad_script
 from utils.db_config import store_script_in_db
 
+logger = logging.getLogger(__name__)
+
+def _prewarm() -> None:
+    """Import the script pipeline and build its lazy clients off the request path."""
+    try:
+        import graph.nodes.script_generator  # noqa: F401
+        from utils.lazy import warm_up
+        warm_up()
+    except Exception as e:
+        logger.warning(f"Pre-warm failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
+    yield
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Video Ad Script Generator API",
     description="API for generating creative ad scripts using LLM",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Define request and response models
@@ -41,11 +63,15 @@ async def create_script(request: ScriptRequest):
     The script is generated using an LLM and stored in the database.
     """
     try:
+        # The pipeline is imported on first use to keep process start-up fast
+        from graph.nodes.script_generator import generate_script_node
+
         # Generate the script using the LLM
-        script = generate_ad_script(request.campaign_idea)
+        result = await run_in_threadpool(generate_script_node, {"user_prompt": request.campaign_idea})
+        script = result["script"]["scenes"]
         
         # Store the script in the database
-        store_script_in_db(request.campaign_idea, script)
+        await run_in_threadpool(store_script_in_db, request.campaign_idea, script)
         
         # Return the response
         return {
@@ -55,6 +81,25 @@ async def create_script(request: ScriptRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating script: {str(e)}")
 
+# Bulk script generation endpoint
+@app.post("/generate-scripts/bulk")
+async def create_scripts_bulk(request: Request):
+    """
+    Generate ad scripts for many campaign ideas at once.
+
+    The body is JSONL with one {"campaign_idea": ...} object per line (an
+    optional "id" is echoed back). Results stream back as JSONL in completion
+    order, one line per item with either "script" or "error".
+    """
+    from utils.scheduler import get_scheduler, parse_jsonl
+
+    body = (await request.body()).decode("utf-8")
+    results = get_scheduler().run(parse_jsonl(body.splitlines()))
+    return StreamingResponse(
+        (json.dumps(result, ensure_ascii=False) + "\n" for result in results),
+        media_type="application/x-ndjson"
+    )
+
 # Run the application with uvicorn
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,30 @@
+import sys
+import json
+import argparse
+from utils.scheduler import BulkScheduler, parse_jsonl, BULK_CONCURRENCY
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate ad scripts for JSONL campaign ideas.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of {\"campaign_idea\": ...} lines (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=BULK_CONCURRENCY, help="Concurrent items")
+    parser.add_argument("--no-db", action="store_true", help="Do not store scripts in the database")
+    args = parser.parse_args()
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    try:
+        for result in BulkScheduler(workers=args.workers).run(parse_jsonl(src), store=not args.no_db):
+            failed += "error" in result
+            dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+            dst.flush()
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
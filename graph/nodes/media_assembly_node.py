@@ -1,12 +1,17 @@
 import os
 import logging
+from contextlib import nullcontext
 from typing import Any, Dict, List
-from tempfile import TemporaryDirectory
 from tqdm import tqdm
 
 from utils.tts import render_tts
-from utils.download import download_file
-from utils.media import trim_and_mux, concatenate_videos 
+from utils.duration import estimate_dialogue_duration, record_tts_duration
+from utils.download import download_partial, KEYFRAME_MARGIN
+from utils.media import (
+    get_duration, trim_and_mux, trim_and_mux_multi, concatenate_videos, concat_copy, HLSPlaylist,
+    validate_formats
+)
+from utils.workspace import get_workspace_manager, estimate_media_bytes
 
 # Configure logging
 logging.basicConfig(
@@ -19,46 +24,134 @@ def generate_audio_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Process scenes to generate audio and combine with video.
     Returns updated state with video paths.
+
+    Intermediates live in a per-job scratch workspace (tmpfs when available)
+    and are deleted as soon as they are consumed; scene and final videos go
+    to the job's output directory. The workspace is state["job_workspace"]
+    when the caller passed one (it holds the clips prefetched by the video
+    node, and the caller closes it); otherwise a fresh one named by
+    state["job_id"] is opened and closed here.
+
+    With state["output_mode"] == "hls" every finished scene is published to an
+    fMP4/HLS playlist immediately, and the final MP4 is joined by stream copy.
+
+    With state["formats"] (e.g. ["16x9", "9x16", "1x1"]) each clip is decoded
+    once and rendered to every format; per-format paths are tracked under
+    "scene_video_paths" and "final_video_paths". The first format also fills
+    the single-path keys.
     """
     scenes: List[Dict[str, Any]] = state["script"]["scenes"]
+    # Reject unknown formats before any scratch space is allocated
+    formats: List[str] = validate_formats(state.get("formats") or [])
     logger.info(f"Processing {len(scenes)} scenes")
-    
-    os.makedirs("scenes", exist_ok=True)
 
-    for scene in tqdm(scenes, desc="Processing scenes"):
-        scene_id = scene["scene_id"]
-        sub_paths = []
-        logger.info(f"Processing scene {scene_id}")
+    owned = state.get("job_workspace")
+    with nullcontext(owned) if owned else get_workspace_manager().job(state.get("job_id")) as ws:
+        playlist = HLSPlaylist(ws.output_path("hls")) if state.get("output_mode") == "hls" else None
+
+        for scene in tqdm(scenes, desc="Processing scenes"):
+            scene_id = scene["scene_id"]
+            sub_paths = []
+            format_sub_paths: Dict[str, List[str]] = {fmt: [] for fmt in formats}
+            logger.info(f"Processing scene {scene_id}")
 
-        with TemporaryDirectory() as tmp:
             for sub in tqdm(scene["sub_scenes"], desc=f"Scene {scene_id} sub-scenes", leave=False):
                 sid = sub["sub_id"]
                 logger.info(f"Processing sub-scene {sid}")
 
-                audio_path = os.path.join(tmp, f"scene{scene_id}_sub{sid}.mp3")
-                raw_vid = os.path.join(tmp, f"scene{scene_id}_sub{sid}.mp4")
-                final_sub = os.path.join("scenes", f"scene{scene_id}_sub{sid}_av.mp4")
-
                 # Generate audio and combine with video using utility functions
+                # 128 kbps MP3 from TTS; the estimate's headroom covers a longer read
+                audio_est = sub.get("estimated_duration") or estimate_dialogue_duration(sub["dialogue"])
+                audio_path = ws.allocate(
+                    f"scene{scene_id}_sub{sid}.mp3", estimate_media_bytes(audio_est, bits_per_second=128_000)
+                )
                 render_tts(sub["dialogue"], audio_path)
-                download_file(sub["video_url"], raw_vid)
-                trim_and_mux(raw_vid, audio_path, final_sub)
+                ws.settle(audio_path)
+                aud_dur = get_duration(audio_path)
+                record_tts_duration(sub["dialogue"], aud_dur)
+
+                # Use the clip prefetched during ranking when it covers the audio
+                raw_vid = sub.pop("prefetched_video", None)
+                if raw_vid and sub.pop("prefetched_duration", 0) >= aud_dur and os.path.exists(raw_vid):
+                    logger.info(f"Using prefetched clip {raw_vid}")
+                else:
+                    if raw_vid:
+                        ws.discard(raw_vid)
+                    # Only fetch the part of the clip the audio will actually cover
+                    raw_vid = ws.allocate(
+                        f"scene{scene_id}_sub{sid}.mp4",
+                        estimate_media_bytes(aud_dur + KEYFRAME_MARGIN)
+                    )
+                    download_partial(sub["video_url"], raw_vid, aud_dur)
+                    ws.settle(raw_vid)
+
+                if formats:
+                    outputs = {
+                        fmt: ws.allocate(
+                            os.path.join(fmt, f"scene{scene_id}_sub{sid}_av.mp4"),
+                            estimate_media_bytes(aud_dur)
+                        )
+                        for fmt in formats
+                    }
+                    trim_and_mux_multi(raw_vid, audio_path, outputs)
+                    for fmt, path in outputs.items():
+                        ws.settle(path)
+                        format_sub_paths[fmt].append(path)
+                else:
+                    final_sub = ws.allocate(f"scene{scene_id}_sub{sid}_av.mp4", estimate_media_bytes(aud_dur))
+                    trim_and_mux(raw_vid, audio_path, final_sub)
+                    ws.settle(final_sub)
+                    sub_paths.append(final_sub)
+
+                ws.discard(raw_vid)
+                ws.discard(audio_path)
 
-                sub_paths.append(final_sub)
+            if formats:
+                # Sub-scenes are already normalized per format, so stream copy is enough
+                scene["scene_video_paths"] = {
+                    fmt: concat_copy(paths, ws.output_path(os.path.join(fmt, f"scene_{scene_id}.mp4")))
+                    for fmt, paths in format_sub_paths.items()
+                }
+                scene_out = scene["scene_video_paths"][formats[0]]
+            else:
+                # Create scene video using concatenate_videos utility
+                scene_out = ws.output_path(f"scene_{scene_id}.mp4")
+                logger.info(f"Creating scene video: {scene_out}")
+                scene_out = concatenate_videos(sub_paths, scene_out, workspace=ws)
+            scene["scene_video_path"] = scene_out
+            if playlist:
+                playlist.append_scene(scene_out)
 
-        # Create scene video using concatenate_videos utility
-        scene_out = os.path.join("scenes", f"scene_{scene_id}.mp4")
-        logger.info(f"Creating scene video: {scene_out}")
-        scene_out = concatenate_videos(sub_paths, scene_out)
-        scene["scene_video_path"] = scene_out
+            for path in sub_paths + [p for paths in format_sub_paths.values() for p in paths]:
+                ws.discard(path)
 
-    # Create final video from all scenes
-    logger.info("Creating final video from all scenes")
-    scene_paths = [scene["scene_video_path"] for scene in scenes]
-    final_video = concatenate_videos(scene_paths, "scenes/final_video.mp4")
+        # Create final video from all scenes
+        logger.info("Creating final video from all scenes")
+        scene_paths = [scene["scene_video_path"] for scene in scenes]
+        final_videos: Dict[str, str] = {}
+        if formats:
+            final_videos = {
+                fmt: concat_copy(
+                    [scene["scene_video_paths"][fmt] for scene in scenes],
+                    ws.output_path(os.path.join(fmt, "final_video.mp4"))
+                )
+                for fmt in formats
+            }
+            final_video = final_videos[formats[0]]
+        elif playlist:
+            # Scenes already share encoding parameters; no need to decode them all again
+            final_video = concat_copy(scene_paths, ws.output_path("final_video.mp4"))
+        else:
+            final_video = concatenate_videos(scene_paths, ws.output_path("final_video.mp4"), workspace=ws)
 
     logger.info("Video generation complete")
-    return {
+    result = {
         "script": {"scenes": scenes},
-        "final_video_path": final_video
-    }
\ No newline at end of file
+        "final_video_path": final_video,
+        "workspace": ws.report()
+    }
+    if final_videos:
+        result["final_video_paths"] = final_videos
+    if playlist:
+        result["playlist_path"] = playlist.finalize()
+    return result
@@ -1,24 +1,29 @@
+import copy
 from typing import Any, Dict
-from langchain_groq import ChatGroq
 from utils.models import ScriptOutput
 from langchain_core.runnables import Runnable
 from utils.prompt import script_prompt, script_parser
-from dotenv import load_dotenv
+from utils.llm_router import route_llm
+from utils.structured_output import JSON_MODE, structured_chain
+from utils.cache import LRUCache
+from utils.env import load_env
 
-load_dotenv()
+load_env()
 
-# Initialize the Groq LLM model
-groq_llm = ChatGroq(
-    model="mistral-saba-24b",
-    temperature=0.7,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-)
+# Route across Groq models with latency-aware hedging
+groq_llm = route_llm("script", temperature=0.7, **JSON_MODE)
 
-script_chain: Runnable = script_prompt | groq_llm | script_parser
+script_chain: Runnable = structured_chain(script_prompt, groq_llm, script_parser)
+
+# Shared across requests and bulk jobs; repeated campaign ideas skip the LLM
+script_cache = LRUCache(maxsize=512)
 
 def generate_script_node(state: Dict[str, Any]) -> Dict[str, Any]:
     user_prompt = state["user_prompt"]
-    script_output: ScriptOutput = script_chain.invoke({"user_prompt": user_prompt})
-    return {"script": script_output.model_dump()}
\ No newline at end of file
+    key = " ".join(user_prompt.lower().split())
+    script = script_cache.get(key)
+    if script is None:
+        script_output: ScriptOutput = script_chain.invoke({"user_prompt": user_prompt})
+        script = script_output.model_dump()
+        script_cache.set(key, script)
+    return {"script": copy.deepcopy(script)}
\ No newline at end of file
@@ -1,37 +1,38 @@
 # graph/nodes/video_finder_node.py
 
-import os
 import json
 import time
 import logging
-import requests
-from typing import Any, Dict, List, Optional
-from langchain_groq import ChatGroq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.runnables import Runnable
-from langchain import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
-from langchain.output_parsers import PydanticOutputParser
 from utils.prompt import rank_videos_prompt, rank_video_parser
-from dotenv import load_dotenv
-
-load_dotenv()
+from utils.duration import estimate_dialogue_duration
+from utils.llm_router import route_llm
+from utils.cache import LRUCache
+from utils.prefetch import Prefetcher
+from utils.models import StockClip
+from utils.stock_providers import get_provider_pool, interleave_clips
+from utils.workspace import Workspace
+from utils.structured_output import JSON_MODE, TolerantPydanticParser, structured_chain
+from utils.env import load_env
+
+load_env()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-SHUTTERSTOCK_TOKEN = os.getenv("SHUTTERSTOCK_TOKEN")
-HEADERS = {
-    "Authorization": f"Bearer {SHUTTERSTOCK_TOKEN}",
-    "Content-Type": "application/x-www-form-urlencoded"
-}
-
 # ——— LLM & Chains ———
-groq_llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.8)
+# Query generation/refinement is cheap and routed to small models; ranking needs a larger one
+query_llm = route_llm("query", temperature=0.8, **JSON_MODE)
+rank_llm = route_llm("rank", temperature=0.8, **JSON_MODE)
 
 # 1) initial single-query prompt
 class SearchQueryOutput(BaseModel):
     query: str = Field(..., description="A single, concise 3–5 word query")
 
-search_query_parser = PydanticOutputParser(pydantic_object=SearchQueryOutput)
+search_query_parser = TolerantPydanticParser(pydantic_object=SearchQueryOutput)
 search_query_prompt = PromptTemplate(
     input_variables=["scene_description"],
     partial_variables={"format_instructions": search_query_parser.get_format_instructions()},
@@ -40,32 +41,44 @@ Generate a single, concise (3–5 word) Shutterstock search query that best matc
 
 "{scene_description}"
 
-Focus on the most distinctive visual element and one contextual cue.
+Focus on the most distinctive visual element and one contextual cue. The query is a single string like "woman waking up", not a list.
+
+{format_instructions}
+"""
+)
+search_chain: Runnable = structured_chain(search_query_prompt, query_llm, search_query_parser)
+
+# 1b) fan-out prompt: several diverse queries in one call
+FAN_OUT_QUERIES = 4
 
-IMPORTANT: Return a SINGLE string query, NOT a list or array. The output should be a simple string like "woman waking up" or "water bottle glow".
+class FanOutQueryOutput(BaseModel):
+    queries: List[str] = Field(..., description="Diverse 1–5 word queries, most specific first")
 
-Example valid outputs:
-{{
-  "query": "woman waking up"
-}}
-or
-{{
-  "query": "water bottle on a table"
-}}
+fanout_query_parser = TolerantPydanticParser(pydantic_object=FanOutQueryOutput)
+fanout_query_prompt = PromptTemplate(
+    input_variables=["scene_description", "count"],
+    partial_variables={"format_instructions": fanout_query_parser.get_format_instructions()},
+    template="""
+Generate {count} different Shutterstock search queries for this scene:
+
+"{scene_description}"
+
+Order them from the most specific (3–5 words, distinctive visual element plus one contextual cue) to the most generic (1–2 words that are 100% guaranteed to return stock footage).
+Each query must use different wording; do not just add or remove minor words.
 
 {format_instructions}
 """
 )
-search_chain: Runnable = search_query_prompt | groq_llm | search_query_parser
+fanout_chain: Runnable = structured_chain(fanout_query_prompt, query_llm, fanout_query_parser)
 
 # 2) ranking chain (unchanged)
-rank_chain: Runnable = rank_videos_prompt | groq_llm | rank_video_parser
+rank_chain: Runnable = structured_chain(rank_videos_prompt, rank_llm, rank_video_parser)
 
 # 3) refine prompt with memory
 class RefinedQueryOutput(BaseModel):
     query: str = Field(..., description="A single improved search query")
 
-refine_query_parser = PydanticOutputParser(pydantic_object=RefinedQueryOutput)
+refine_query_parser = TolerantPydanticParser(pydantic_object=RefinedQueryOutput)
 refine_query_prompt = PromptTemplate(
     input_variables=["scene_description", "history"],
     partial_variables={"format_instructions": refine_query_parser.get_format_instructions()},
@@ -77,55 +90,47 @@ Scene description:
 "{scene_description}"
 
 You must propose a completely new and most simplest version 3–5 word query that is NOT in the history above and is 100% guaranteed to return results on a stock video site. **Don't just add "too", "at" minor changes; completely change it to the most simplest searchable query!**
-
-Return only valid JSON (no extra text):
-
-{{
-  "query": "<new query>"
-}}
-
-Example of refinement:
-{{
-    "Failed query": "smart water bottle notification" 
-}}
- and it's refined version:
-{{
-    "query": "water bottle"
-}} 
-or
-{{
-    "query": "notification"
-}}
-
+For example, "smart water bottle notification" could be refined to "water bottle" or "notification".
 
 {format_instructions}
 """
 )
-refine_chain: Runnable = refine_query_prompt | groq_llm | refine_query_parser
+refine_chain: Runnable = structured_chain(refine_query_prompt, query_llm, refine_query_parser)
 
 # ——— Helper functions ———
 
-def _shutterstock_search(query: str, per_page: int = 10) -> List[Dict[str, Any]]:
-    resp = requests.get(
-        "https://api.shutterstock.com/v2/videos/search",
-        params={"query": query, "per_page": per_page, "view": "full"},
-        headers=HEADERS
-    )
-    resp.raise_for_status()
-    return resp.json().get("data", [])
+def _stock_search(query: str, per_page: int = 10) -> List[StockClip]:
+    """Search every configured stock provider concurrently; slow or rate-limited ones count as no results."""
+    return get_provider_pool().search(query, per_page)
 
-def _rank_and_pick(candidates: List[Dict[str, Any]], desc: str) -> Optional[str]:
+# Number of candidates shown to the ranking LLM
+RANK_WINDOW = 10
+
+def _ranking_window(candidates: List[StockClip], min_duration: Optional[float] = None) -> List[StockClip]:
+    """The candidates the ranker can actually choose from."""
+    if min_duration:
+        # A clip shorter than the voice-over would cut the audio off when muxed
+        candidates = [c for c in candidates if c.duration >= min_duration]
+    return candidates[:RANK_WINDOW]
+
+def _rank_and_pick(
+    candidates: List[StockClip],
+    desc: str,
+    min_duration: Optional[float] = None
+) -> Optional[str]:
+    candidates = _ranking_window(candidates, min_duration)
     if not candidates:
         return None
 
     options = []
-    for idx, item in enumerate(candidates[:10]):
+    for idx, item in enumerate(candidates):
         options.append({
             "id": idx,
-            "description": item["description"],
-            "keywords": item.get("keywords", []),
-            "categories": [c["name"] for c in item.get("categories", [])],
-            "duration": item["duration"],
+            "description": item.description,
+            "keywords": item.keywords,
+            "categories": item.categories,
+            "duration": item.duration,
+            "resolution": item.resolution,
         })
 
     best_index = rank_chain.invoke({
@@ -134,22 +139,94 @@ def _rank_and_pick(candidates: List[Dict[str, Any]], desc: str) -> Optional[str]
     }).best_index
 
     chosen = candidates[min(best_index, len(candidates) - 1)]
-    return chosen["assets"]["preview_mp4"]["url"]
+    return chosen.preview_url
+
+def _fan_out_search(queries: List[str], per_page: int = 10) -> List[StockClip]:
+    """Run all queries concurrently and merge the results round-robin, de-duplicated per provider."""
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        result_lists = list(pool.map(lambda q: _stock_search(q, per_page), queries))
+
+    # Interleave so every query's top hits make it into the ranking window
+    return interleave_clips(result_lists)
+
+def _find_with_fan_out(
+    desc: str,
+    count: int,
+    min_duration: Optional[float] = None,
+    prefetcher: Optional[Prefetcher] = None
+) -> Tuple[Optional[str], List[str]]:
+    queries = [q.strip() for q in fanout_chain.invoke({
+        "scene_description": desc,
+        "count": count
+    }).queries if q.strip()]
+    queries = list(dict.fromkeys(queries))[:count]
+    logger.info(f"Fan-out queries: {queries!r}")
+    if not queries:
+        return None, []
+
+    candidates = _fan_out_search(queries)
+    logger.info(f"Fan-out returned {len(candidates)} unique candidates")
+    if prefetcher:
+        # Download the likeliest winners while the LLM ranks, among the clips it can pick
+        prefetcher.start(_ranking_window(candidates, min_duration), desc, min_duration)
+    return _rank_and_pick(candidates, desc, min_duration), queries
+
+def _refine_query(desc: str, seen: List[str]) -> str:
+    history_json = json.dumps(seen, ensure_ascii=False)
+    refined = refine_chain.invoke({
+        "scene_description": desc,
+        "history": history_json
+    }).query.strip()
+    logger.info(f"Refined query: {refined!r}")
+    return refined
 
 # ——— Core recursive search ———
 
+# Shared across jobs: identical sub-scene descriptions resolve without new searches
+search_cache = LRUCache(maxsize=2048)
+
 def find_video_url(
     desc: str,
     max_attempts: int = 10,
-    timeout_seconds: int = 60
+    timeout_seconds: int = 60,
+    min_duration: Optional[float] = None,
+    fan_out: int = FAN_OUT_QUERIES,
+    prefetcher: Optional[Prefetcher] = None
+) -> Optional[str]:
+    cache_key = (desc.strip().lower(), round(min_duration or 0, 1))
+    url = search_cache.get(cache_key)
+    if url:
+        logger.info(f"Search cache hit for '{desc}': {url}")
+        return url
+    url = _search_video_url(desc, max_attempts, timeout_seconds, min_duration, fan_out, prefetcher)
+    if url:
+        search_cache.set(cache_key, url)
+    return url
+
+def _search_video_url(
+    desc: str,
+    max_attempts: int,
+    timeout_seconds: int,
+    min_duration: Optional[float],
+    fan_out: int,
+    prefetcher: Optional[Prefetcher]
 ) -> Optional[str]:
     start = time.time()
     seen: List[str] = []
 
-    # 1) initial query
-    initial = search_chain.invoke({"scene_description": desc}).query
-    query = initial.strip()
-    logger.info(f"Initial query: {query!r}")
+    if fan_out > 1:
+        # 1) one LLM call, all queries searched concurrently, single ranking
+        url, seen = _find_with_fan_out(desc, fan_out, min_duration, prefetcher)
+        if url:
+            logger.info(f"Found video for '{desc}' via fan-out: {url}")
+            return url
+        # Refinement is the last-resort fallback
+        query = _refine_query(desc, seen)
+    else:
+        # 1) initial query
+        initial = search_chain.invoke({"scene_description": desc}).query
+        query = initial.strip()
+        logger.info(f"Initial query: {query!r}")
 
     attempts = 0
     while True:
@@ -167,30 +244,51 @@ def find_video_url(
             break
 
         seen.append(query)
-        logger.info(f"[Attempt {attempts}] Searching Shutterstock for: {query!r}")
-        results = _shutterstock_search(query)
-        url = _rank_and_pick(results, desc)
+        logger.info(f"[Attempt {attempts}] Searching stock footage for: {query!r}")
+        results = _stock_search(query)
+        if prefetcher:
+            prefetcher.start(_ranking_window(results, min_duration), desc, min_duration)
+        url = _rank_and_pick(results, desc, min_duration)
         if url:
             logger.info(f"Found video for '{desc}' with query '{query}': {url}")
             return url
 
         # refine
-        history_json = json.dumps(seen, ensure_ascii=False)
-        refined = refine_chain.invoke({
-            "scene_description": desc,
-            "history": history_json
-        }).query.strip()
-        logger.info(f"Refined query: {refined!r}")
         print(f"Failed query: {query}")
-        query = refined
+        query = _refine_query(desc, seen)
 
     logger.warning(f"No video found for scene: {desc!r}")
     return None
 
 def generate_video_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pick a stock clip for every sub-scene.
+
+    When the caller passes an open workspace as state["job_workspace"], the
+    likeliest candidates are prefetched into it while ranking runs, and the
+    winner is recorded on the sub-scene for the media node. The caller owns
+    that workspace and closes it once the job is done or has failed.
+    """
     # import ipdb; ipdb.set_trace()
+    ws: Optional[Workspace] = state.get("job_workspace")
     for scene in state["script"]["scenes"]:
         for sub in scene["sub_scenes"]:
-            sub["video_url"] = find_video_url(sub["visual_description"])
+            sub["estimated_duration"] = estimate_dialogue_duration(sub["dialogue"])
+            prefetcher = Prefetcher(
+                ws, f"scene{scene['scene_id']}_sub{sub['sub_id']}", sub["estimated_duration"]
+            ) if ws else None
+            try:
+                sub["video_url"] = find_video_url(
+                    sub["visual_description"],
+                    min_duration=sub["estimated_duration"],
+                    prefetcher=prefetcher
+                )
+            except Exception:
+                if prefetcher:
+                    prefetcher.cancel_all()
+                raise
+            prefetched = prefetcher.commit(sub["video_url"]) if prefetcher else None
+            if prefetched:
+                sub["prefetched_video"], sub["prefetched_duration"] = prefetched
         print(f"Sub: {sub}")
     return {"script": state["script"]}
\ No newline at end of file
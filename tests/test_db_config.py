@@ -0,0 +1,44 @@
+import psycopg2
+import pytest
+
+from utils import db_config
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+
+class FakePool:
+    def __init__(self):
+        self.returned = []
+
+    def getconn(self):
+        return FakeConnection()
+
+    def putconn(self, connection, close=False):
+        self.returned.append(close)
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(db_config, "get_db_pool", lambda: pool)
+    return pool
+
+def test_healthy_connection_goes_back_to_the_pool(pool):
+    with db_config.pooled_connection():
+        pass
+    with pytest.raises(ValueError):
+        with db_config.pooled_connection():
+            raise ValueError("bad row")
+    assert pool.returned == [False, False]
+
+@pytest.mark.parametrize("error", [psycopg2.OperationalError, psycopg2.InterfaceError])
+def test_broken_connection_is_closed(pool, error):
+    with pytest.raises(error):
+        with db_config.pooled_connection():
+            raise error("server closed the connection unexpectedly")
+    assert pool.returned == [True]
+
+def test_connection_closed_underneath_is_not_reused(pool):
+    with db_config.pooled_connection() as connection:
+        connection.closed = 2
+    assert pool.returned == [True]
@@ -0,0 +1,122 @@
+import os
+import re
+import shutil
+import threading
+import subprocess
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.download import download_file, download_partial, supports_range, DownloadCancelled
+
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves server.files, honouring Range when server.ranges is set and counting bytes sent."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        body = server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        start, end = 0, len(body) - 1
+        match = RANGE.match(self.headers.get("Range", ""))
+        if server.ranges and match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        try:
+            for offset in range(start, end + 1, 64 * 1024):
+                chunk = body[offset:min(offset + 64 * 1024, end + 1)]
+                self.wfile.write(chunk)
+                with server.lock:
+                    server.bytes_sent += len(chunk)
+                if server.delay:
+                    time.sleep(server.delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+@pytest.fixture
+def http_server():
+    def start(files, ranges=True, delay=0.0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        server.daemon_threads = True
+        server.files, server.ranges, server.delay = files, ranges, delay
+        server.bytes_sent, server.lock = 0, threading.Lock()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture(scope="module")
+def long_clip(tmp_path_factory):
+    if not shutil.which("ffmpeg"):
+        pytest.skip("ffmpeg is not installed")
+    path = str(tmp_path_factory.mktemp("media") / "long.mp4")
+    subprocess.run([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=25",
+        "-t", "60", "-c:v", "libx264", "-preset", "ultrafast", "-g", "25", "-b:v", "4M",
+        "-movflags", "+faststart", path
+    ], check=True, capture_output=True)
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_supports_range(http_server):
+    _, url = http_server({"/a.bin": b"x" * 10}, ranges=True)
+    assert supports_range(url + "/a.bin")
+    _, url = http_server({"/a.bin": b"x" * 10}, ranges=False)
+    assert not supports_range(url + "/a.bin")
+
+def test_partial_fetch_transfers_only_the_needed_span(http_server, long_clip, tmp_path):
+    server, url = http_server({"/clip.mp4": long_clip})
+    dest = str(tmp_path / "part.mp4")
+
+    download_partial(url + "/clip.mp4", dest, duration=3.0)
+
+    assert 0 < os.path.getsize(dest) < len(long_clip) / 2
+    assert server.bytes_sent < len(long_clip) / 2
+
+def test_falls_back_to_full_download_without_range(http_server, tmp_path):
+    body = os.urandom(300 * 1024)
+    server, url = http_server({"/clip.mp4": body}, ranges=False)
+    dest = str(tmp_path / "full.mp4")
+
+    download_partial(url + "/clip.mp4", dest, duration=3.0)
+
+    with open(dest, "rb") as f:
+        assert f.read() == body
+
+def test_cancel_aborts_full_download(http_server, tmp_path):
+    _, url = http_server({"/clip.mp4": os.urandom(1024 * 1024)}, ranges=False, delay=0.05)
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+
+    with pytest.raises(DownloadCancelled):
+        download_file(url + "/clip.mp4", str(tmp_path / "full.mp4"), cancel)
+
+def test_cancel_aborts_partial_download(http_server, long_clip, tmp_path):
+    _, url = http_server({"/clip.mp4": long_clip}, delay=0.05)
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+
+    start = time.monotonic()
+    with pytest.raises(DownloadCancelled):
+        download_partial(url + "/clip.mp4", str(tmp_path / "part.mp4"), duration=25.0, cancel=cancel)
+    assert time.monotonic() - start < 5
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from utils import duration
+
+@pytest.fixture
+def calibration(tmp_path, monkeypatch):
+    path = tmp_path / "calibration.json"
+    monkeypatch.setattr(duration, "CALIBRATION_PATH", str(path))
+    monkeypatch.setattr(duration, "_factors", None)
+    return path
+
+def test_estimate_counts_words_and_pauses(calibration):
+    text = "one two three four five six seven eight nine ten eleven twelve thirteen [PAUSE:1.5s]"
+    assert duration.estimate_dialogue_duration(text) == pytest.approx(13 / duration.DEFAULT_WORDS_PER_SECOND + 1.5)
+
+def test_record_keeps_other_workers_updates(calibration, monkeypatch):
+    text = " ".join(["word"] * 26)
+    duration.record_tts_duration(text, 12.0, voice_id="a")
+
+    # Another worker that loaded the file earlier writes its own voice meanwhile
+    calibration.write_text(json.dumps({"a": 1.2, "b": 0.8}))
+    duration.record_tts_duration(text, 12.0, voice_id="a")
+
+    saved = json.loads(calibration.read_text())
+    assert saved["b"] == 0.8
+    assert saved["a"] == pytest.approx(0.8 * 1.2 + 0.2 * 1.2)
+    assert duration.estimate_dialogue_duration(text, voice_id="b") == pytest.approx(10.0 * 0.8)
+    assert [p.name for p in calibration.parent.iterdir()] == ["calibration.json"]
@@ -0,0 +1,33 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous enough for a cold CI runner; a client built at import time blows well past it
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "3.0"))
+HEAVY_MODULES = ["langchain_groq", "elevenlabs", "psycopg2"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+@pytest.mark.parametrize("module", ["app", "graph.nodes.script_generator"])
+def test_import_stays_within_budget(module):
+    # A fresh interpreter so nothing is already imported by the test session
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
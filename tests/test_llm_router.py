@@ -0,0 +1,110 @@
+import time
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from utils.latency import LatencyTracker
+from utils.llm_router import HedgedLLM
+from utils.rate_limit import TokenBucket
+
+def fake_model(name, latency=0.0, error=None):
+    """A local stand-in for a chat model that answers with its own name after `latency` seconds."""
+    def call(_):
+        time.sleep(latency)
+        if error:
+            raise error
+        return name
+
+    async def acall(_):
+        await asyncio.sleep(latency)
+        if error:
+            raise error
+        return name
+
+    return RunnableLambda(call, afunc=acall)
+
+def router(models, **kwargs):
+    return HedgedLLM(models, tracker=LatencyTracker(), limiter=None, **kwargs)
+
+def test_fast_primary_is_not_hedged():
+    llm = router({"a": fake_model("a", 0.01), "b": fake_model("b", 0.01)}, default_hedge_delay=1.0)
+    assert llm.invoke("hi") == "a"
+    assert llm.tracker.snapshot().keys() == {"a"}
+
+def test_slow_primary_is_hedged_and_fastest_wins():
+    llm = router({"a": fake_model("a", 2.0), "b": fake_model("b", 0.05)}, default_hedge_delay=0.5)
+    start = time.monotonic()
+    assert llm.invoke("hi") == "b"
+    assert time.monotonic() - start < 1.5
+
+def test_error_moves_to_next_model():
+    llm = router({"a": fake_model("a", error=RuntimeError("boom")), "b": fake_model("b")})
+    assert llm.invoke("hi") == "b"
+    assert llm.tracker.error_rate("a") == 1.0
+
+def test_all_models_failing_raises_last_error():
+    llm = router({
+        "a": fake_model("a", error=RuntimeError("a down")),
+        "b": fake_model("b", error=RuntimeError("b down")),
+    })
+    with pytest.raises(RuntimeError, match="b down"):
+        llm.invoke("hi")
+
+def test_routes_to_measurably_faster_model():
+    llm = router({"a": fake_model("a"), "b": fake_model("b")})
+    for _ in range(10):
+        llm.tracker.record("a", 3.0, ok=True)
+        llm.tracker.record("b", 0.1, ok=True)
+    assert llm.ranked_models() == ["b", "a"]
+
+def test_async_hedge_cancels_loser():
+    llm = router({"a": fake_model("a", 2.0), "b": fake_model("b", 0.05)}, default_hedge_delay=0.5)
+
+    async def run():
+        start = time.monotonic()
+        result = await llm.ainvoke("hi")
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == "b"
+    assert elapsed < 1.5
+
+def test_quota_throttling_does_not_trigger_hedges():
+    buckets = {"a": TokenBucket(1.0, 1.0), "b": TokenBucket(1.0, 1.0)}
+    llm = HedgedLLM(
+        {"a": fake_model("a", 0.05), "b": fake_model("b", 0.05)},
+        tracker=LatencyTracker(),
+        default_hedge_delay=0.5,
+        limiter=buckets.__getitem__,
+    )
+    # Waiting ~1s per call on a's bucket must not count towards a's hedge delay
+    assert [llm.invoke("hi") for _ in range(4)] == ["a"] * 4
+
+def test_no_hedge_to_a_model_without_quota():
+    buckets = {"a": TokenBucket(10.0, 1.0), "b": TokenBucket(0.01, 1.0)}
+    buckets["b"].acquire()
+    llm = HedgedLLM(
+        {"a": fake_model("a", 0.8), "b": fake_model("b", 0.01)},
+        tracker=LatencyTracker(),
+        default_hedge_delay=0.5,
+        limiter=buckets.__getitem__,
+    )
+    assert llm.invoke("hi") == "a"
+
+def test_sync_invoke_cancels_the_losing_request():
+    finished = []
+
+    async def slow(_):
+        try:
+            await asyncio.sleep(2.0)
+            finished.append("a")
+            return "a"
+        except asyncio.CancelledError:
+            finished.append("cancelled")
+            raise
+
+    llm = router({"a": RunnableLambda(lambda _: "a", afunc=slow), "b": fake_model("b", 0.05)}, default_hedge_delay=0.5)
+    assert llm.invoke("hi") == "b"
+    time.sleep(0.1)
+    assert finished == ["cancelled"]
@@ -0,0 +1,68 @@
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from utils.media import ENCODE_ARGS, HLSPlaylist, concat_copy, validate_formats
+from graph.nodes import media_assembly_node
+
+def test_validate_formats_dedupes_in_order():
+    assert validate_formats(["9x16", "16x9", "9x16"]) == ["9x16", "16x9"]
+
+def test_unknown_format_fails_before_any_work(monkeypatch):
+    def no_workspace():
+        raise AssertionError("workspace opened for an invalid request")
+    monkeypatch.setattr(media_assembly_node, "get_workspace_manager", no_workspace)
+
+    with pytest.raises(ValueError, match="4x3"):
+        media_assembly_node.generate_audio_node({"script": {"scenes": []}, "formats": ["16x9", "4x3"]})
+
+@pytest.fixture(scope="module")
+def scenes(tmp_path_factory):
+    if not shutil.which("ffmpeg"):
+        pytest.skip("ffmpeg is not installed")
+    out = tmp_path_factory.mktemp("scenes")
+    paths = []
+    for i, seconds in enumerate([3, 2]):
+        path = str(out / f"scene_{i}.mp4")
+        subprocess.run([
+            "ffmpeg", "-y",
+            "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=duration={seconds}",
+            *ENCODE_ARGS, "-shortest", path
+        ], check=True, capture_output=True)
+        paths.append(path)
+    return paths
+
+def playlist_entries(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def test_hls_playlist_grows_scene_by_scene(scenes, tmp_path):
+    out_dir = str(tmp_path / "hls")
+    playlist = HLSPlaylist(out_dir)
+    assert "#EXT-X-ENDLIST" not in playlist_entries(playlist.path)
+
+    for count, scene in enumerate(scenes, start=1):
+        lines = playlist_entries(playlist.append_scene(scene))
+        assert sum(line.startswith("#EXT-X-MAP:") for line in lines) == count
+        assert lines.count("#EXT-X-DISCONTINUITY") == count - 1
+        assert "#EXT-X-ENDLIST" not in lines
+        uris = [line for line in lines if not line.startswith("#")]
+        uris += [line.split('"')[1] for line in lines if line.startswith("#EXT-X-MAP:")]
+        assert uris and all(os.path.exists(os.path.join(out_dir, uri)) for uri in uris)
+
+    lines = playlist_entries(playlist.finalize())
+    assert lines[-1] == "#EXT-X-ENDLIST"
+    total = sum(float(line[len("#EXTINF:"):].rstrip(",")) for line in lines if line.startswith("#EXTINF:"))
+    assert total == pytest.approx(5.0, abs=0.2)
+
+def test_concat_copy_joins_scenes_without_reencoding(scenes, tmp_path):
+    out = concat_copy(scenes, str(tmp_path / "final.mp4"))
+    # Decoding the whole file checks it plays through; ffmpeg reports the decoded time
+    probe = subprocess.run(["ffmpeg", "-i", out, "-f", "null", "-"], check=True, capture_output=True, text=True)
+    decoded = re.findall(r"time=(\d+):(\d+):([\d.]+)", probe.stderr)[-1]
+    assert int(decoded[0]) * 3600 + int(decoded[1]) * 60 + float(decoded[2]) == pytest.approx(5.0, abs=0.2)
+    assert not os.path.exists(out + ".txt")
@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+
+from utils import prefetch
+from utils.models import StockClip
+from utils.prefetch import Prefetcher
+from utils.workspace import WorkspaceManager, MB
+from graph.nodes import video_finder_node
+
+@pytest.fixture
+def manager(tmp_path):
+    return WorkspaceManager(
+        scratch_root=str(tmp_path / "scratch"),
+        output_root=str(tmp_path / "jobs"),
+        tmpfs_root=None,
+        job_quota=20 * MB,
+        global_quota=20 * MB,
+    )
+
+@pytest.fixture(autouse=True)
+def fake_download(monkeypatch):
+    def download(url, dest, duration, cancel=None):
+        with open(dest, "wb") as f:
+            f.write(b"\0" * (4 * MB))
+    monkeypatch.setattr(prefetch, "download_partial", download)
+
+def clip(i, description="a dog on a beach"):
+    return StockClip(provider="fake", id=str(i), description=description, duration=10, preview_url=f"http://clips/{i}")
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_commit_keeps_winner_and_discards_losers(manager):
+    with manager.job() as ws:
+        prefetcher = Prefetcher(ws, "sub", duration=5.0, top_k=3)
+        prefetcher.start([clip(1), clip(2), clip(3, "city at night")], "dog beach")
+
+        path, span = prefetcher.commit("http://clips/2")
+
+        assert os.path.exists(path) and span >= 5.0
+        assert wait_for(lambda: ws.used_bytes == 4 * MB)
+
+def test_same_job_id_gets_isolated_workspaces(manager):
+    with manager.job("retry") as first, manager.job("retry") as second:
+        assert first is not second
+        assert first.scratch_dir != second.scratch_dir
+
+def test_failed_finder_leaves_no_scratch_behind(manager, monkeypatch):
+    def find_then_fail(desc, min_duration=None, prefetcher=None):
+        prefetcher.start([clip(1), clip(2)], desc, min_duration)
+        raise RuntimeError("search failed")
+    monkeypatch.setattr(video_finder_node, "find_video_url", find_then_fail)
+    state = {"script": {"scenes": [{"scene_id": 1, "sub_scenes": [
+        {"sub_id": 1, "dialogue": "hello there", "visual_description": "dog beach"}
+    ]}]}}
+
+    with pytest.raises(RuntimeError):
+        with manager.job() as ws:
+            video_finder_node.generate_video_node({**state, "job_workspace": ws})
+
+    assert not os.path.exists(ws.scratch_dir)
+    assert wait_for(lambda: manager.used_bytes == 0)
+    with manager.job() as ws:
+        ws.allocate("next.mp4", 18 * MB, timeout=0)
+
+def test_finder_without_workspace_does_not_prefetch(monkeypatch):
+    seen = []
+    def find(desc, min_duration=None, prefetcher=None):
+        seen.append(prefetcher)
+        return "http://clips/1"
+    monkeypatch.setattr(video_finder_node, "find_video_url", find)
+    state = {"script": {"scenes": [{"scene_id": 1, "sub_scenes": [
+        {"sub_id": 1, "dialogue": "hello there", "visual_description": "dog beach"}
+    ]}]}}
+
+    result = video_finder_node.generate_video_node(state)
+
+    assert seen == [None]
+    assert "prefetched_video" not in result["script"]["scenes"][0]["sub_scenes"][0]
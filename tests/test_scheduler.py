@@ -0,0 +1,47 @@
+import pytest
+
+from utils import db_config
+from utils.scheduler import BulkScheduler, parse_jsonl
+
+class FakeScheduler(BulkScheduler):
+    def _generate(self, item):
+        if item["campaign_idea"] == "boom":
+            raise RuntimeError("generation failed")
+        return [{"scene_id": 1, "idea": item["campaign_idea"]}]
+
+@pytest.fixture
+def stored(monkeypatch):
+    rows = []
+    def store(batch):
+        rows.extend(batch)
+        return True
+    monkeypatch.setattr(db_config, "store_scripts_in_db", store)
+    return rows
+
+def ideas(*names):
+    return [{"campaign_idea": name} for name in names]
+
+def test_parse_jsonl_reports_bad_lines():
+    items = list(parse_jsonl(['{"campaign_idea": "a"}', "not json", '{"id": 1}', ""]))
+    assert items[0] == {"campaign_idea": "a"}
+    assert "line 2" in items[1]["error"] and "Line 3" in items[2]["error"]
+
+def test_every_item_yields_one_result(stored):
+    results = list(FakeScheduler(workers=2, batch_size=2).run(ideas("a", "boom", "b", "c")))
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    assert [r["error"] for r in results if "error" in r] == ["generation failed"]
+    assert sorted(idea for idea, _ in stored) == ["a", "b", "c"]
+
+def test_closing_early_still_stores_generated_scripts(stored):
+    results = FakeScheduler(workers=1, batch_size=50).run(ideas("a", "boom", "c", "d"))
+    # The failure is reported straight away while "a" is still waiting for its batch
+    assert next(results)["error"] == "generation failed"
+    assert stored == []
+    results.close()
+    assert "a" in [idea for idea, _ in stored]
+
+def test_failed_insert_marks_its_items(monkeypatch):
+    monkeypatch.setattr(db_config, "store_scripts_in_db", lambda batch: False)
+    results = list(FakeScheduler(workers=2, batch_size=10).run(ideas("a", "b")))
+    assert all(r["error"] == "Script was generated but could not be stored" for r in results)
+    assert all("script" in r for r in results)
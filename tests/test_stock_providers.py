@@ -0,0 +1,124 @@
+import time
+
+import pytest
+import requests
+
+from utils.models import StockClip
+from utils.stock_providers import ProviderPool, ProviderRateLimited, StockProvider, MIN_HIT_RATE, interleave_clips
+
+class FakeProvider(StockProvider):
+    """Answers after `latency` seconds with `hits` clips, or raises `error`."""
+
+    def __init__(self, name, latency=0.0, hits=2, error=None):
+        self.name = name
+        self.latency = latency
+        self.hits = hits
+        self.error = error
+        self.calls = 0
+
+    def search(self, query, per_page=10):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return [
+            StockClip(provider=self.name, id=f"{query}-{i}", description=query, duration=10,
+                      preview_url=f"http://{self.name}/{query}/{i}")
+            for i in range(min(self.hits, per_page))
+        ]
+
+def providers_of(clips):
+    return {c.provider for c in clips}
+
+def test_merges_all_providers_round_robin():
+    pool = ProviderPool([FakeProvider("a", hits=2), FakeProvider("b", hits=2)])
+    clips = pool.search("dog")
+    assert len(clips) == 4
+    assert [c.provider for c in clips[:2]] in (["a", "b"], ["b", "a"])
+
+def test_soft_deadline_returns_without_the_slow_provider():
+    pool = ProviderPool([FakeProvider("fast", 0.01), FakeProvider("slow", 2.0)], soft_timeout=0.3, hard_timeout=5.0)
+    start = time.monotonic()
+    clips = pool.search("dog")
+    assert time.monotonic() - start < 1.0
+    assert providers_of(clips) == {"fast"}
+
+def test_hard_deadline_waits_past_soft_for_a_first_result():
+    pool = ProviderPool([FakeProvider("slow", 0.5), FakeProvider("empty", 0.01, hits=0)], soft_timeout=0.1, hard_timeout=5.0)
+    assert providers_of(pool.search("dog")) == {"slow"}
+
+def test_hard_deadline_gives_up():
+    pool = ProviderPool([FakeProvider("stuck", 3.0)], soft_timeout=0.1, hard_timeout=0.3)
+    start = time.monotonic()
+    assert pool.search("dog") == []
+    assert time.monotonic() - start < 1.0
+
+def test_rate_limited_provider_cools_down():
+    limited = FakeProvider("limited", error=ProviderRateLimited("limited", retry_after=60))
+    ok = FakeProvider("ok")
+    pool = ProviderPool([limited, ok], soft_timeout=0.5)
+
+    assert providers_of(pool.search("dog")) == {"ok"}
+    assert providers_of(pool.search("cat")) == {"ok"}
+    assert limited.calls == 1
+    assert [p.name for p in pool.ranked()] == ["ok"]
+
+def test_provider_that_never_hits_becomes_fallback_only():
+    empty = FakeProvider("empty", hits=0)
+    good = FakeProvider("good")
+    pool = ProviderPool([empty, good], soft_timeout=0.5)
+    for i in range(5):
+        pool.search(f"warmup {i}")
+    assert pool.hit_rate("empty") == 0.0 < MIN_HIT_RATE
+
+    calls = empty.calls
+    for i in range(5):
+        assert providers_of(pool.search(f"query {i}")) == {"good"}
+    assert empty.calls == calls
+
+def test_fallback_is_used_when_primaries_find_nothing():
+    rare, good = FakeProvider("rare", hits=0), FakeProvider("good")
+    pool = ProviderPool([rare, good], soft_timeout=0.5)
+    for i in range(5):
+        pool.search(f"warmup {i}")
+    rare.hits, good.hits = 1, 0
+    assert providers_of(pool.search("dog")) == {"rare"}
+
+def test_stats_report_latency_and_hit_rate():
+    pool = ProviderPool([FakeProvider("a")], soft_timeout=0.5)
+    for i in range(5):
+        pool.search(f"q{i}")
+    stats = pool.stats()["a"]
+    assert stats["hit_rate"] == 1.0
+    assert stats["p50"] is not None and stats["error_rate"] == 0.0
+
+def test_needs_a_provider():
+    with pytest.raises(ValueError):
+        ProviderPool([])
+
+def test_interleave_clips_round_robin_and_dedupes():
+    a = FakeProvider("a", hits=3).search("x")
+    b = FakeProvider("b", hits=1).search("x")
+    merged = interleave_clips([a, b, a[:1]])
+    assert [(c.provider, c.id) for c in merged] == [("a", "x-0"), ("b", "x-0"), ("a", "x-1"), ("a", "x-2")]
+
+def http_error(status):
+    resp = requests.Response()
+    resp.status_code = status
+    return requests.HTTPError(f"{status} Client Error", response=resp)
+
+def test_auth_failure_is_raised_when_no_provider_answers():
+    pool = ProviderPool([FakeProvider("bad", error=http_error(401))], soft_timeout=0.5)
+    with pytest.raises(requests.HTTPError, match="401"):
+        pool.search("dog")
+
+def test_auth_failure_does_not_hide_a_healthy_provider():
+    pool = ProviderPool([FakeProvider("bad", error=http_error(403)), FakeProvider("ok")], soft_timeout=0.5)
+    assert providers_of(pool.search("dog")) == {"ok"}
+
+def test_timeouts_and_rate_limits_count_as_no_results():
+    pool = ProviderPool([
+        FakeProvider("timeout", error=requests.Timeout("read timed out")),
+        FakeProvider("limited", error=ProviderRateLimited("limited")),
+    ], soft_timeout=0.5)
+    assert pool.search("dog") == []
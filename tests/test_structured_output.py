@@ -0,0 +1,84 @@
+import json
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+from langchain_core.exceptions import OutputParserException
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from utils.structured_output import (
+    TolerantPydanticParser, compact_schema, parse_stats, repair_json, structured_chain
+)
+
+class Scene(BaseModel):
+    scene_id: int
+    dialogue: Optional[str] = None
+
+class Script(BaseModel):
+    title: str
+    scenes: List[Scene]
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Sure! Here it is: {"a": [1, 2,],} Hope that helps {really}.', {"a": [1, 2]}),
+    ('{"a": {"b": "x", "c": [1, 2', {"a": {"b": "x", "c": [1, 2]}}),
+    ('{"a": "cut off mid str', {"a": "cut off mid str"}),
+    ('{"a": "braces } and ] in a string"}', {"a": "braces } and ] in a string"}),
+    ('[{"q": "dog"}, {"q": "cat"}]', [{"q": "dog"}, {"q": "cat"}]),
+])
+def test_repair_json(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+def test_compact_schema_is_a_json_shape():
+    assert json.loads(compact_schema(Script)) == {
+        "title": "string",
+        "scenes": [{"scene_id": "int", "dialogue": "string"}],
+    }
+
+def test_parser_counts_ok_repaired_and_failed():
+    class Counted(BaseModel):
+        value: int
+
+    parser = TolerantPydanticParser(pydantic_object=Counted)
+    assert parser.parse('{"value": 1}').value == 1
+    assert parser.parse('```json\n{"value": 2,}\n```').value == 2
+    with pytest.raises(OutputParserException):
+        parser.parse("no json here")
+
+    stats = parse_stats()
+    assert (stats["Counted.ok"], stats["Counted.repaired"], stats["Counted.failed"]) == (1, 1, 1)
+
+def _chain(outputs, retries=1):
+    calls = []
+    def llm(_):
+        calls.append(1)
+        out = outputs[min(len(calls), len(outputs)) - 1]
+        if isinstance(out, Exception):
+            raise out
+        return out
+    prompt = PromptTemplate.from_template("{x}")
+    parser = TolerantPydanticParser(pydantic_object=Scene)
+    return structured_chain(prompt, RunnableLambda(llm), parser, retries=retries), calls
+
+def test_chain_retries_only_unparseable_output():
+    chain, calls = _chain(["garbage", '{"scene_id": 3}'])
+    assert chain.invoke({"x": "go"}).scene_id == 3
+    assert len(calls) == 2
+
+def test_chain_does_not_retry_repairable_output():
+    chain, calls = _chain(['{"scene_id": 4,'])
+    assert chain.invoke({"x": "go"}).scene_id == 4
+    assert len(calls) == 1
+
+def test_chain_does_not_retry_other_errors():
+    chain, calls = _chain([RuntimeError("provider down"), '{"scene_id": 5}'])
+    with pytest.raises(RuntimeError):
+        chain.invoke({"x": "go"})
+    assert len(calls) == 1
+
+def test_chain_gives_up_after_retries():
+    chain, calls = _chain(["garbage"], retries=2)
+    with pytest.raises(OutputParserException):
+        chain.invoke({"x": "go"})
+    assert len(calls) == 3
@@ -0,0 +1,38 @@
+import os
+import time
+
+import pytest
+
+from utils import tts
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_CACHE_DIR", str(tmp_path / "cache"))
+    os.makedirs(tts.TTS_CACHE_DIR)
+    return tmp_path / "cache"
+
+def put(cache_dir, name, nbytes, age):
+    path = cache_dir / f"{name}.mp3"
+    path.write_bytes(b"\0" * nbytes)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+def test_eviction_drops_least_recently_used_first(cache_dir):
+    old = put(cache_dir, "old", 400, age=30)
+    mid = put(cache_dir, "mid", 400, age=20)
+    new = put(cache_dir, "new", 400, age=10)
+
+    tts._evict_cache(max_bytes=900)
+
+    assert not old.exists() and mid.exists() and new.exists()
+
+def test_cache_hit_refreshes_recency(cache_dir, tmp_path, monkeypatch):
+    cached = put(cache_dir, "hit", 10, age=100)
+    monkeypatch.setattr(tts, "_cache_path", lambda text: str(cached))
+    monkeypatch.setattr(tts, "get_client", lambda: pytest.fail("cache hit must not call the API"))
+
+    tts.render_tts("hello", str(tmp_path / "out" / "a.mp3"))
+
+    assert (tmp_path / "out" / "a.mp3").read_bytes() == b"\0" * 10
+    assert time.time() - cached.stat().st_mtime < 5
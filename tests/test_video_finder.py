@@ -0,0 +1,100 @@
+import json
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from utils.models import StockClip
+from graph.nodes import video_finder_node as finder
+
+class FakeChain:
+    """Stands in for an LLM chain; `respond` maps the prompt inputs to the parsed output."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+
+    def invoke(self, inputs):
+        self.calls.append(inputs)
+        return self.respond(inputs)
+
+def clip(id, description="dog on a beach", duration=10.0):
+    return StockClip(provider="fake", id=id, description=description, duration=duration, preview_url=f"http://clips/{id}")
+
+@pytest.fixture
+def chains(monkeypatch):
+    fanout = FakeChain(lambda _: SimpleNamespace(queries=["dog beach", "dog", "beach", "dog"]))
+    rank = FakeChain(lambda _: SimpleNamespace(best_index=0))
+    refine = FakeChain(lambda _: SimpleNamespace(query="puppy"))
+    monkeypatch.setattr(finder, "fanout_chain", fanout)
+    monkeypatch.setattr(finder, "rank_chain", rank)
+    monkeypatch.setattr(finder, "refine_chain", refine)
+    return SimpleNamespace(fanout=fanout, rank=rank, refine=refine)
+
+def test_fan_out_searches_concurrently_and_ranks_once(chains, monkeypatch):
+    active, peak, searched = [0], [0], []
+    lock = threading.Lock()
+
+    def search(query, per_page=10):
+        with lock:
+            searched.append(query)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        # Every query also returns the shared clip "both"
+        return [clip(f"{query}-1"), clip("both")]
+    monkeypatch.setattr(finder, "_stock_search", search)
+
+    start = time.monotonic()
+    url = finder._search_video_url("a dog on a beach", 10, 60, None, 4, None)
+
+    assert url == "http://clips/dog beach-1"
+    assert sorted(searched) == ["beach", "dog", "dog beach"]
+    assert peak[0] == 3 and time.monotonic() - start < 0.5
+    assert len(chains.rank.calls) == 1
+    options = chains.rank.calls[0]["video_info"]["options"]
+    assert len(options) == 4
+    assert chains.refine.calls == []
+
+def test_refine_only_runs_when_fan_out_finds_nothing(chains, monkeypatch):
+    results = {"puppy": [clip("p1")]}
+    monkeypatch.setattr(finder, "_stock_search", lambda query, per_page=10: results.get(query, []))
+
+    url = finder._search_video_url("a dog on a beach", 10, 60, None, 4, None)
+
+    assert url == "http://clips/p1"
+    assert len(chains.refine.calls) == 1
+    assert json.loads(chains.refine.calls[0]["history"]) == ["dog beach", "dog", "beach"]
+    assert len(chains.rank.calls) == 1
+
+def test_short_clips_are_never_ranked(chains):
+    assert finder._rank_and_pick([clip("short", duration=2.0)], "dog", min_duration=5.0) is None
+    assert chains.rank.calls == []
+
+def test_prefetch_only_sees_the_ranking_window(chains, monkeypatch):
+    # 3 queries x 8 clips; the best word-overlap matches sit outside the first 10
+    def search(query, per_page=10):
+        return [clip(f"{query}-{i}", "dog on a beach" if i >= 6 else "city") for i in range(8)]
+    monkeypatch.setattr(finder, "_stock_search", search)
+
+    class RecordingPrefetcher:
+        def start(self, candidates, desc, min_duration=None):
+            self.candidates = candidates
+
+    prefetcher = RecordingPrefetcher()
+    finder._search_video_url("a dog on a beach", 10, 60, None, 4, prefetcher)
+
+    options = chains.rank.calls[0]["video_info"]["options"]
+    assert len(prefetcher.candidates) == len(options) == finder.RANK_WINDOW
+    assert [c.description for c in prefetcher.candidates] == [o["description"] for o in options]
+
+def test_missing_provider_config_is_not_treated_as_no_footage(chains, monkeypatch):
+    def unconfigured():
+        raise RuntimeError("No stock providers configured")
+
+    monkeypatch.setattr(finder, "get_provider_pool", unconfigured)
+    with pytest.raises(RuntimeError, match="No stock providers"):
+        finder._find_with_fan_out("a dog", 1)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import threading
+import subprocess
+
+import pytest
+
+from utils.workspace import WorkspaceManager, QuotaExceeded, MB
+
+@pytest.fixture
+def manager(tmp_path):
+    return WorkspaceManager(
+        scratch_root=str(tmp_path / "scratch"),
+        output_root=str(tmp_path / "jobs"),
+        tmpfs_root=None,
+        job_quota=10 * MB,
+        global_quota=12 * MB,
+    )
+
+def write(path, nbytes):
+    with open(path, "wb") as f:
+        f.write(b"\0" * nbytes)
+
+def test_allocate_settle_discard_tracks_usage(manager):
+    with manager.job("a") as ws:
+        path = ws.allocate("clip.mp4", 4 * MB)
+        assert manager.used_bytes == 4 * MB
+        write(path, MB)
+        ws.settle(path)
+        assert manager.used_bytes == MB
+        ws.discard(path)
+        assert manager.used_bytes == 0 and not os.path.exists(path)
+        assert ws.report()["peak_scratch_bytes"] == 4 * MB
+    assert not os.path.exists(ws.scratch_dir)
+
+def test_job_over_its_quota_fails_fast(manager):
+    with manager.job("a") as ws:
+        ws.allocate("one.mp4", 8 * MB)
+        with pytest.raises(QuotaExceeded):
+            ws.allocate("two.mp4", 4 * MB)
+
+def test_global_quota_applies_backpressure(manager):
+    first, second = manager.job("a"), manager.job("b")
+    first.allocate("big.mp4", 8 * MB)
+    with pytest.raises(QuotaExceeded):
+        second.allocate("big.mp4", 8 * MB, timeout=0.1)
+
+    threading.Timer(0.2, first.close).start()
+    second.allocate("big.mp4", 8 * MB, timeout=5)
+    second.close()
+    assert manager.used_bytes == 0
+
+@pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="ffmpeg/ffprobe not installed")
+def test_concatenate_counts_normalized_copies(manager, tmp_path):
+    from utils import media
+    clips = []
+    for i in range(2):
+        clip = str(tmp_path / f"in{i}.mp4")
+        subprocess.run([
+            "ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=30",
+            "-f", "lavfi", "-i", "sine", "-t", "1", "-shortest", clip
+        ], check=True, capture_output=True)
+        clips.append(clip)
+
+    with manager.job("a") as ws:
+        media.concatenate_videos(clips, ws.output_path("out.mp4"), workspace=ws)
+        assert ws.peak_bytes > 0
+        assert ws.used_bytes == 0
+
+def test_tmpfs_is_reserved_per_job_and_falls_back_to_disk(tmp_path):
+    tmpfs = tmp_path / "shm"
+    tmpfs.mkdir()
+    manager = WorkspaceManager(
+        scratch_root=str(tmp_path / "scratch"),
+        output_root=str(tmp_path / "jobs"),
+        tmpfs_root=str(tmpfs),
+        job_quota=MB,
+        global_quota=100 * MB,
+        tmpfs_quota=2 * MB,
+    )
+    jobs = [manager.job() for _ in range(3)]
+    assert [ws.on_tmpfs for ws in jobs] == [True, True, False]
+    assert jobs[2].scratch_dir.startswith(str(tmp_path / "scratch"))
+
+    jobs[0].close()
+    replacement = manager.job()
+    assert replacement.on_tmpfs
+    for ws in jobs[1:] + [replacement]:
+        ws.close()
+    assert manager.tmpfs_reserved == 0
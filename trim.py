@@ -3,27 +3,37 @@ import ffmpeg
 import requests
 from module.script import generate_ad_script
 from module.video_finder import VideoFinderAgent
+from utils.workspace import get_workspace_manager, estimate_media_bytes
 
 class VideoAssembler:
-    def __init__(self, output_dir: str = "outputs/final", temp_dir: str = "outputs/temp"):
+    def __init__(self, output_dir: str = "outputs/final", job_id: str = None):
         self.output_dir = output_dir
-        self.temp_dir = temp_dir
+        # Raw downloads live in an isolated per-job scratch workspace; trimmed clips go to output_dir
+        self.workspace = get_workspace_manager().job(job_id)
+        self.temp_dir = self.workspace.scratch_dir
         os.makedirs(self.output_dir, exist_ok=True)
-        os.makedirs(self.temp_dir, exist_ok=True)
         self.script = []
         self.clips = {}
 
+    def close(self):
+        """Delete the scratch workspace and everything left in it."""
+        self.workspace.close()
+
     def load_script_and_clips(self, script, clips):
         self.script = script
         self.clips = clips
 
-    def _download_video_if_needed(self, url: str, scene_id: int) -> str:
+    def _download_video_if_needed(self, url: str, scene_id: int, duration_s: float) -> str:
         filename = os.path.join(self.temp_dir, f"scene_{scene_id}_raw.mp4")
         if not os.path.exists(filename):
             r = requests.get(url, stream=True)
+            # Reserve the advertised size against the job quota before writing
+            size = int(r.headers.get("Content-Length") or estimate_media_bytes(duration_s))
+            filename = self.workspace.allocate(os.path.basename(filename), size)
             with open(filename, 'wb') as f:
                 for chunk in r.iter_content(chunk_size=8192):
                     f.write(chunk)
+            self.workspace.settle(filename)
         return filename
 
     def trim_clips(self):
@@ -35,8 +45,8 @@ class VideoAssembler:
                 print(f"⚠️ No clip found for scene {scene_id}")
                 continue
 
-            input_path = self._download_video_if_needed(clip_info['video_file_url'], scene_id)
-            output_path = os.path.join(self.temp_dir, f"scene_{scene_id}_trimmed.mp4")
+            input_path = self._download_video_if_needed(clip_info['video_file_url'], scene_id, duration_s)
+            output_path = os.path.join(self.output_dir, f"scene_{scene_id}_trimmed.mp4")
 
             try:
                 (
@@ -48,6 +58,9 @@ class VideoAssembler:
                 print(f"✅ Trimmed scene {scene_id} to {duration_s}s → {output_path}")
             except ffmpeg.Error as e:
                 print(f"❌ Error trimming scene {scene_id}: {e}")
+            finally:
+                # The raw download is consumed once trimmed
+                self.workspace.discard(input_path)
 
 if __name__ == '__main__':
     assembler = VideoAssembler()
@@ -58,4 +71,7 @@ if __name__ == '__main__':
     clips = agent.process_script(script)
     assembler.load_script_and_clips(script, clips)
 
-    assembler.trim_clips()
\ No newline at end of file
+    try:
+        assembler.trim_clips()
+    finally:
+        assembler.close()
\ No newline at end of file
@@ -4,11 +4,13 @@ This module handles database configuration and operations.
 
 import os
 import json
-import psycopg2
-from dotenv import load_dotenv
+from contextlib import contextmanager
+from typing import List, Tuple
+from utils.env import load_env
+from utils.lazy import lazy
 
 # Load environment variables
-load_dotenv()
+load_env()
 
 # Database connection parameters
 DB_HOST = os.getenv("DB_HOST")
@@ -16,14 +18,16 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
 
 def get_db_connection():
     """
     Creates and returns a connection to the PostgreSQL database.
-    
+
     Returns:
         A connection object to the database
     """
+    import psycopg2
     return psycopg2.connect(
         dbname=DB_NAME,
         user=DB_USER,
@@ -32,33 +36,80 @@ def get_db_connection():
         port=DB_PORT
     )
 
+@lazy
+def get_db_pool():
+    """
+    Creates the process-wide connection pool on first use.
+
+    Returns:
+        A thread-safe psycopg2 connection pool
+    """
+    from psycopg2.pool import ThreadedConnectionPool
+    return ThreadedConnectionPool(
+        1, DB_POOL_SIZE,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+
+@contextmanager
+def pooled_connection():
+    """Borrow a connection from the pool and return it when done; broken connections are discarded."""
+    import psycopg2
+    pool = get_db_pool()
+    connection = pool.getconn()
+    broken = False
+    try:
+        yield connection
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        # After a DB restart or network drop the connection is dead; don't hand it out again
+        pool.putconn(connection, close=broken or bool(connection.closed))
+
 def store_script_in_db(campaign_idea: str, script: list):
     """
     Stores the generated script into the PostgreSQL database.
-    
+
     Args:
         campaign_idea: The original user prompt/campaign idea
         script: The generated script as a list of scene dictionaries
     """
-    connection = None
-    try:
-        # Connect to the PostgreSQL database
-        connection = get_db_connection()
-        cursor = connection.cursor()
+    store_scripts_in_db([(campaign_idea, script)])
+
+def store_scripts_in_db(rows: List[Tuple[str, list]]) -> bool:
+    """
+    Stores several generated scripts with a single batched INSERT.
 
-        # Insert the script into the scripts table
-        insert_query = """
-        INSERT INTO scripts (user_prompt, script)
-        VALUES (%s, %s)
-        """
-        cursor.execute(insert_query, (campaign_idea, json.dumps(script)))
-        connection.commit()
-        print("Script inserted successfully!")
+    Args:
+        rows: (campaign_idea, script) pairs
+
+    Returns:
+        True if the batch was committed
+    """
+    if not rows:
+        return True
+    try:
+        from psycopg2.extras import execute_values
+        with pooled_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    # Insert the scripts into the scripts table
+                    execute_values(
+                        cursor,
+                        "INSERT INTO scripts (user_prompt, script) VALUES %s",
+                        [(idea, json.dumps(script)) for idea, script in rows]
+                    )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        print(f"{len(rows)} script(s) inserted successfully!")
+        return True
 
     except Exception as error:
-        print(f"Error while inserting script: {error}")
-    finally:
-        # Close the database connection
-        if connection:
-            cursor.close()
-            connection.close()
+        print(f"Error while inserting scripts: {error}")
+        return False
@@ -1,9 +1,20 @@
+import os
 import logging
+import threading
+import subprocess
 import requests
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
-def download_file(url: str, dest: str) -> None:
+# Extra seconds fetched past the requested duration so the later re-encode
+# always has a keyframe and a few frames of slack to cut from.
+KEYFRAME_MARGIN = 2.0
+
+class DownloadCancelled(Exception):
+    """Raised when a download is aborted through its cancel event."""
+
+def download_file(url: str, dest: str, cancel: Optional[threading.Event] = None) -> None:
     """Download a file from URL to destination path."""
     logger.info(f"Downloading from: {url}")
     try:
@@ -11,8 +22,79 @@ def download_file(url: str, dest: str) -> None:
         resp.raise_for_status()
         with open(dest, "wb") as f:
             for chunk in resp.iter_content(8192):
+                if cancel is not None and cancel.is_set():
+                    resp.close()
+                    raise DownloadCancelled(url)
                 f.write(chunk)
         logger.info(f"Download completed: {dest}")
     except requests.RequestException as e:
         logger.error(f"Error downloading {url}: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
+
+def supports_range(url: str, timeout: float = 10.0) -> bool:
+    """Check whether the server honours HTTP Range requests for this URL."""
+    try:
+        resp = requests.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout)
+        resp.close()
+        return resp.status_code == 206
+    except requests.RequestException as e:
+        logger.warning(f"Range probe failed for {url}: {str(e)}")
+        return False
+
+def _run_ffmpeg(cmd: List[str], cancel: Optional[threading.Event]) -> None:
+    if cancel is None:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    while True:
+        try:
+            _, stderr = proc.communicate(timeout=0.2)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel.is_set():
+                proc.kill()
+                proc.communicate()
+                raise DownloadCancelled(cmd[-1])
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+
+def download_partial(
+    url: str,
+    dest: str,
+    duration: float,
+    margin: float = KEYFRAME_MARGIN,
+    cancel: Optional[threading.Event] = None
+) -> None:
+    """
+    Fetch only the first `duration` seconds (plus `margin`) of a remote MP4.
+
+    ffmpeg reads the moov index and the needed mdat ranges over HTTP Range
+    requests and stream-copies them into `dest`, so only the bytes covering
+    the requested span are transferred. Falls back to a full download when
+    the server does not support ranges or ffmpeg cannot seek the source.
+    Setting `cancel` aborts the transfer with DownloadCancelled.
+    """
+    if not supports_range(url):
+        logger.info(f"Server does not support Range, falling back to full download: {url}")
+        download_file(url, dest, cancel)
+        return
+
+    span = duration + margin
+    logger.info(f"Partial download of {span:.2f}s from: {url}")
+    cmd = [
+        "ffmpeg", "-y",
+        "-seekable", "1",
+        "-i", url,
+        "-t", str(span),
+        "-map", "0",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        dest
+    ]
+    try:
+        _run_ffmpeg(cmd, cancel)
+        logger.info(f"Partial download completed: {dest} ({os.path.getsize(dest)} bytes)")
+    except (subprocess.CalledProcessError, OSError) as e:
+        stderr = getattr(e, "stderr", None) or str(e)
+        logger.warning(f"Partial download failed, falling back to full download: {stderr}")
+        download_file(url, dest, cancel)
@@ -0,0 +1,89 @@
+"""
+Fast local estimate of spoken dialogue duration, calibrated against real TTS output.
+"""
+
+import os
+import re
+import json
+import logging
+import tempfile
+import threading
+from typing import Dict, Optional
+from utils.env import load_env
+
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Matches the [PAUSE:X.Xs] markers the script prompt asks the LLM to emit
+PAUSE_PATTERN = re.compile(r'\[PAUSE:(\d+\.?\d*)s\]')
+
+# Baseline narration pace for eleven_multilingual_v2 at speed 1.0
+DEFAULT_WORDS_PER_SECOND = 2.6
+# Weight of the newest observation in the per-voice correction factor
+CALIBRATION_ALPHA = 0.2
+
+CALIBRATION_PATH = os.getenv("TTS_CALIBRATION_PATH", "tts_calibration.json")
+
+_lock = threading.Lock()
+_factors: Optional[Dict[str, float]] = None
+
+def _read_factors() -> Dict[str, float]:
+    try:
+        with open(CALIBRATION_PATH) as f:
+            return {k: float(v) for k, v in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        logger.debug(f"No TTS calibration loaded from {CALIBRATION_PATH}: {str(e)}")
+        return {}
+
+def _write_factors(factors: Dict[str, float]) -> None:
+    # Write-then-rename so readers never see a torn file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(CALIBRATION_PATH)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(factors, f)
+        os.replace(tmp, CALIBRATION_PATH)
+    except OSError:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def _load_factors() -> Dict[str, float]:
+    global _factors
+    if _factors is None:
+        _factors = _read_factors()
+    return _factors
+
+def _raw_estimate(text: str) -> float:
+    pauses = sum(float(p) for p in PAUSE_PATTERN.findall(text))
+    words = len(PAUSE_PATTERN.sub(" ", text).split())
+    return words / DEFAULT_WORDS_PER_SECOND + pauses
+
+def _voice_key(voice_id: Optional[str]) -> str:
+    return voice_id or os.getenv("ELEVEN_VOICE_ID") or "default"
+
+def estimate_dialogue_duration(text: str, voice_id: Optional[str] = None) -> float:
+    """Estimate the spoken duration of `text` in seconds, including pause markers."""
+    with _lock:
+        factor = _load_factors().get(_voice_key(voice_id), 1.0)
+    return _raw_estimate(text) * factor
+
+def record_tts_duration(text: str, actual: float, voice_id: Optional[str] = None) -> None:
+    """Fold an observed TTS duration into the per-voice calibration factor."""
+    raw = _raw_estimate(text)
+    if raw <= 0 or actual <= 0:
+        return
+    key = _voice_key(voice_id)
+    global _factors
+    with _lock:
+        # Start from the file so updates other workers made since we loaded are kept
+        factors = {**_load_factors(), **_read_factors()}
+        ratio = actual / raw
+        prev = factors.get(key)
+        factors[key] = ratio if prev is None else (1 - CALIBRATION_ALPHA) * prev + CALIBRATION_ALPHA * ratio
+        _factors = factors
+        try:
+            _write_factors(factors)
+        except OSError as e:
+            logger.warning(f"Could not persist TTS calibration: {str(e)}")
+    logger.debug(f"Calibration for voice {key}: {factors[key]:.3f} (raw {raw:.2f}s, actual {actual:.2f}s)")
@@ -0,0 +1,11 @@
+"""
+Single entry point for loading the .env file.
+"""
+
+from dotenv import load_dotenv
+from utils.lazy import lazy
+
+@lazy
+def load_env() -> bool:
+    """Load environment variables from .env once per process."""
+    return load_dotenv()
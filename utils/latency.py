@@ -0,0 +1,59 @@
+"""
+Rolling latency and error-rate statistics, shared by LLM routing and stock providers.
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+WINDOW_SIZE = 100           # rolling samples kept per key
+MIN_SAMPLES = 5             # below this percentiles are reported as unknown
+
+
+class LatencyTracker:
+    """Rolling latency and error-rate statistics per key (model, provider, ...)."""
+
+    def __init__(self, window: int = WINDOW_SIZE):
+        self._window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._outcomes: Dict[str, Deque[bool]] = {}
+
+    def record(self, key: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.setdefault(key, deque(maxlen=self._window)).append(ok)
+            if ok:
+                self._latencies.setdefault(key, deque(maxlen=self._window)).append(latency)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def error_rate(self, key: str) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes.get(key, ()))
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def expected_latency(self, key: str) -> Optional[float]:
+        """Median latency inflated by the error rate, or None without enough data."""
+        p50 = self.percentile(key, 0.5)
+        if p50 is None:
+            return None
+        return p50 / max(1.0 - self.error_rate(key), 0.05)
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        with self._lock:
+            keys = set(self._outcomes)
+        return {
+            m: {
+                "p50": self.percentile(m, 0.5),
+                "p99": self.percentile(m, 0.99),
+                "error_rate": self.error_rate(m),
+            }
+            for m in keys
+        }
@@ -0,0 +1,53 @@
+"""
+Thread-safe lazy construction of clients and models so importing a module stays cheap.
+"""
+
+import logging
+import threading
+import functools
+from typing import Any, Callable, Generic, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_UNSET = object()
+_registry: List["Lazy"] = []
+_registry_lock = threading.Lock()
+
+class Lazy(Generic[T]):
+    """Build a value with `factory` on first call, exactly once, even under concurrent access."""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Any = _UNSET
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, factory)
+        with _registry_lock:
+            _registry.append(self)
+
+    def __call__(self) -> T:
+        if self._value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self._factory()
+        return self._value
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not _UNSET
+
+def lazy(factory: Callable[[], T]) -> Lazy[T]:
+    """Decorator form of Lazy."""
+    return Lazy(factory)
+
+def warm_up() -> None:
+    """Build every registered lazy value; meant to run in a background thread at startup."""
+    with _registry_lock:
+        pending = [item for item in _registry if not item.ready]
+    for item in pending:
+        try:
+            item()
+        except Exception as e:
+            logger.warning(f"Pre-warm of {getattr(item, '__name__', item)} failed: {str(e)}")
+    logger.info(f"Pre-warmed {len(pending)} lazy resources")
@@ -0,0 +1,244 @@
+"""
+Latency-aware routing and hedging of LLM calls across several chat models.
+
+Every task (script writing, query generation, ranking) has an ordered list of
+candidate models. Calls go to the currently best model; if it has not answered
+within a percentile of its own recent latency, the request is hedged to the
+next model and whichever finishes first wins; the other request is cancelled.
+Sync callers run on a shared background event loop so that cancellation
+reaches the in-flight HTTP call.
+"""
+
+import os
+import time
+import functools
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.runnables import Runnable, RunnableConfig
+from utils.lazy import Lazy, lazy
+from utils.latency import LatencyTracker
+from utils.rate_limit import TokenBucket
+from utils.env import load_env
+
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Candidate models per task, in order of preference. Cheap tasks go to small models first.
+TASK_MODELS: Dict[str, List[str]] = {
+    "script": ["mistral-saba-24b", "llama-3.3-70b-versatile"],
+    "rank": ["llama-3.3-70b-versatile", "mistral-saba-24b"],
+    "query": ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+}
+
+HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_DELAY = 8.0   # seconds
+MIN_HEDGE_DELAY = 0.5
+MAX_HEDGE_DELAY = 30.0
+PREFERENCE_STEP = 1.5       # a model must be this much faster to overtake one listed before it
+REQUEST_TIMEOUT = 60.0
+# Provider quota per model; shared by every request and bulk job in the process
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+
+@lazy
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """A long-lived event loop in a daemon thread that runs every sync call; async clients stay bound to it."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-router", daemon=True).start()
+    return loop
+
+
+tracker = LatencyTracker()
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+def limiter_for(model: str) -> TokenBucket:
+    """The process-wide rate limiter for a model."""
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = TokenBucket(REQUESTS_PER_MINUTE / 60.0, max(REQUESTS_PER_MINUTE / 6.0, 1.0))
+        return _limiters[model]
+
+
+class HedgedLLM(Runnable):
+    """
+    A chat-model runnable that routes to the fastest healthy model and hedges slow calls.
+
+    `models` maps model names to any runnables (real chat models or local fakes),
+    in order of preference. Calls wait on the per-model `limiter` (pass None to disable);
+    the primary's wait happens before the hedge clock starts, and a hedge is only sent
+    to a model with quota to spare, so throttling never triggers extra calls.
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, Runnable],
+        tracker: LatencyTracker = tracker,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        default_hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        limiter: Optional[Callable[[str], TokenBucket]] = limiter_for,
+    ):
+        if not models:
+            raise ValueError("HedgedLLM needs at least one model")
+        self.models = models
+        self.tracker = tracker
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.limiter = limiter
+
+    def ranked_models(self) -> List[str]:
+        names = list(self.models)
+        costs = {n: self.tracker.expected_latency(n) for n in names}
+        known = [c for c in costs.values() if c is not None]
+        # Unmeasured models are treated as on par with the best one so the preference order decides
+        neutral = min(known) if known else 0.0
+
+        def key(item: Tuple[int, str]) -> float:
+            idx, name = item
+            cost = costs[name] if costs[name] is not None else neutral
+            return cost * (PREFERENCE_STEP ** idx)
+
+        return [name for _, name in sorted(enumerate(names), key=key)]
+
+    def hedge_delay(self, model: str) -> float:
+        delay = self.tracker.percentile(model, self.hedge_percentile)
+        if delay is None:
+            delay = self.default_hedge_delay
+        return min(max(delay, MIN_HEDGE_DELAY), MAX_HEDGE_DELAY)
+
+    def _has_quota(self, name: str) -> bool:
+        return not self.limiter or self.limiter(name).try_acquire()
+
+    def _next_with_quota(self, remaining: List[str]) -> Optional[str]:
+        for name in remaining:
+            if self._has_quota(name):
+                remaining.remove(name)
+                return name
+        return None
+
+    async def _acall(self, name: str, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        start = time.monotonic()
+        try:
+            result = await self.models[name].ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.tracker.record(name, time.monotonic() - start, ok=False)
+            raise
+        self.tracker.record(name, time.monotonic() - start, ok=True)
+        return result
+
+    async def _acall_with_quota(self, name: str, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        if self.limiter:
+            await self.limiter(name).acquire_async()
+        return await self._acall(name, input, config, **kwargs)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        # Run the async path so a losing request is really cancelled instead of left running in a thread
+        loop = _event_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("HedgedLLM.invoke cannot block the router's own event loop; use ainvoke")
+        future = asyncio.run_coroutine_threadsafe(self.ainvoke(input, config, **kwargs), loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        order = self.ranked_models()
+        remaining = order[1:]
+        delay = self.hedge_delay(order[0])
+        pending: Dict[asyncio.Task, str] = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch(name: str, call: Callable[..., Any]) -> None:
+            pending[asyncio.ensure_future(call(name, input, config, **kwargs))] = name
+
+        if self.limiter:
+            await self.limiter(order[0]).acquire_async()
+        launch(order[0], self._acall)
+        deadline = time.monotonic() + delay
+        try:
+            while pending:
+                timeout = max(deadline - time.monotonic(), 0.0) if remaining and not hedged else None
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    name = self._next_with_quota(remaining)
+                    if name is None:
+                        logger.info(f"Not hedging after {delay:.2f}s; no model has quota to spare")
+                        continue
+                    logger.info(f"Hedging to {name} after {delay:.2f}s without a response")
+                    launch(name, self._acall)
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        logger.warning(f"Model {name} failed: {str(e)}")
+                        last_error = e
+                        if remaining and not pending:
+                            launch(remaining.pop(0), self._acall_with_quota)
+            raise last_error
+        finally:
+            for loser in pending:
+                loser.cancel()
+
+
+class LazyRunnable(Runnable):
+    """Runnable that builds the wrapped chat model on first use."""
+
+    def __init__(self, factory: Callable[[], Runnable]):
+        self._get = Lazy(factory)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self._get().invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self._get().ainvoke(input, config, **kwargs)
+
+
+def _groq_factory(model: str, temperature: float, **model_kwargs: Any) -> Runnable:
+    from langchain_groq import ChatGroq
+    return ChatGroq(
+        model=model,
+        temperature=temperature,
+        max_tokens=None,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=1,
+        **model_kwargs,
+    )
+
+_model_cache: Dict[Tuple, Runnable] = {}
+_model_cache_lock = threading.Lock()
+
+def route_llm(
+    task: str,
+    temperature: float,
+    factory: Callable[..., Runnable] = _groq_factory,
+    **model_kwargs: Any
+) -> HedgedLLM:
+    """
+    Build a hedged runnable over the candidate models configured for `task`.
+
+    Models are only constructed on first use (or by utils.lazy.warm_up).
+    """
+    models: Dict[str, Runnable] = {}
+    for name in TASK_MODELS[task]:
+        key = (factory, name, temperature, repr(sorted(model_kwargs.items())))
+        with _model_cache_lock:
+            if key not in _model_cache:
+                _model_cache[key] = LazyRunnable(functools.partial(factory, name, temperature, **model_kwargs))
+            models[name] = _model_cache[key]
+    return HedgedLLM(models)
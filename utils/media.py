@@ -2,10 +2,56 @@ import os
 import json
 import subprocess
 import logging
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from utils.workspace import Workspace, estimate_media_bytes
 
 logger = logging.getLogger(__name__)
 
+# Shared encoding parameters: every normalized clip and scene uses these so
+# outputs can be stream-copied into segments or concatenated without re-encoding.
+# One keyframe per second keeps HLS segment boundaries aligned.
+ENCODE_ARGS = [
+    "-c:v", "libx264",
+    "-c:a", "aac",
+    "-b:a", "192k",
+    "-preset", "ultrafast",
+    "-r", "30",
+    "-b:v", "5M",
+    "-maxrate", "5M",
+    "-bufsize", "10M",
+    "-pix_fmt", "yuv420p",
+    "-g", "30",
+    "-keyint_min", "30",
+    "-sc_threshold", "0",
+    "-profile:v", "high",
+    "-level", "4.0",
+]
+
+HLS_SEGMENT_SECONDS = 2
+
+# Deliverable formats: name -> (width, height, fit). "pad" letterboxes the whole
+# frame, "crop" fills the frame and trims the overflow.
+ASPECT_FORMATS: Dict[str, Tuple[int, int, str]] = {
+    "16x9": (1920, 1080, "pad"),
+    "9x16": (1080, 1920, "crop"),
+    "1x1": (1080, 1080, "crop"),
+}
+
+def validate_formats(formats: List[str]) -> List[str]:
+    """Check requested deliverable formats against ASPECT_FORMATS; returns them de-duplicated in order."""
+    unknown = [fmt for fmt in formats if fmt not in ASPECT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown output format(s) {', '.join(unknown)}; expected one of {', '.join(ASPECT_FORMATS)}")
+    return list(dict.fromkeys(formats))
+
+def fit_filter(fmt: str) -> str:
+    """Scale filter chain that fits a source into the given deliverable format."""
+    width, height, fit = ASPECT_FORMATS[fmt]
+    if fit == "crop":
+        return f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1"
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1")
+
 def get_duration(path: str) -> float:
     """Get the duration of a media file using ffprobe."""
     cmd = [
@@ -66,90 +112,112 @@ def trim_and_mux(video_in: str, audio_in: str, out_path: str) -> None:
         logger.error(f"Error in trim_and_mux: {str(e)}")
         raise
 
-def concatenate_videos(video_paths: List[str], output_path: str) -> str:
+def trim_and_mux_multi(video_in: str, audio_in: str, out_paths: Dict[str, str]) -> Dict[str, str]:
+    """
+    Trim video to the audio duration and render every format in `out_paths` in one ffmpeg run.
+
+    The source is decoded once and fanned out with `split` into one scale/crop/pad
+    branch per format. Outputs are encoded with ENCODE_ARGS, so they are already
+    normalized and can be joined with concat_copy.
+    """
+    try:
+        aud_dur = get_duration(audio_in)
+        logger.info(f"Audio duration: {aud_dur:.2f}s, rendering formats: {', '.join(out_paths)}")
+
+        formats = list(out_paths)
+        labels = [f"[s{i}]" for i in range(len(formats))]
+        branches = [f"[0:v]split={len(formats)}{''.join(labels)}"]
+        for i, fmt in enumerate(formats):
+            branches.append(f"{labels[i]}{fit_filter(fmt)}[v{i}]")
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-t", str(aud_dur), "-i", video_in,
+            "-i", audio_in,
+            "-filter_complex", ";".join(branches),
+        ]
+        for i, fmt in enumerate(formats):
+            os.makedirs(os.path.dirname(out_paths[fmt]) or ".", exist_ok=True)
+            cmd += ["-map", f"[v{i}]", "-map", "1:a", *ENCODE_ARGS, "-shortest", out_paths[fmt]]
+
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        logger.info(f"Rendered {len(formats)} formats from a single decode of {video_in}")
+        return out_paths
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error: {e.stderr}")
+        raise
+
+def concatenate_videos(video_paths: List[str], output_path: str, workspace: Optional[Workspace] = None) -> str:
     """
     Concatenate videos using filter_complex for better synchronization and quality.
     Normalizes all videos to consistent parameters before concatenation.
     Handles both video and audio streams.
+    With a `workspace`, the normalized copies go to its scratch space and count against its quota.
     """
     logger.info("Starting video concatenation process")
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     from tempfile import TemporaryDirectory
-    with TemporaryDirectory() as tmpdir:
+    with TemporaryDirectory(dir=workspace.scratch_dir if workspace else None) as tmpdir:
         # Normalize videos
         normalized_clips = []
-        for i, clip in enumerate(video_paths):
-            normalized_path = os.path.join(tmpdir, f"normalized_{i}.mp4")
-            logger.info(f"Normalizing clip {i+1}/{len(video_paths)}: {os.path.basename(clip)}")
+        try:
+            for i, clip in enumerate(video_paths):
+                normalized_path = os.path.join(tmpdir, f"normalized_{i}.mp4")
+                if workspace:
+                    normalized_path = workspace.allocate(
+                        os.path.relpath(normalized_path, workspace.scratch_dir),
+                        estimate_media_bytes(get_duration(clip))
+                    )
+                normalized_clips.append(normalized_path)
+                logger.info(f"Normalizing clip {i+1}/{len(video_paths)}: {os.path.basename(clip)}")
+                
+                cmd_normalize = [
+                    "ffmpeg", "-y",
+                    "-i", clip,
+                    "-vf", "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2",
+                    *ENCODE_ARGS,
+                    normalized_path
+                ]
+                try:
+                    subprocess.run(cmd_normalize, check=True, capture_output=True, text=True)
+                except subprocess.CalledProcessError as e:
+                    logger.error(f"Error normalizing {clip}: {e.stderr}")
+                    raise
+                if workspace:
+                    workspace.settle(normalized_path)
+
+            # Build concatenation filter
+            filter_complex = []
+            inputs = []
+            for i, clip in enumerate(normalized_clips):
+                inputs.extend(["-i", clip])
+                filter_complex.append(f"[{i}:v][{i}:a]")
             
-            cmd_normalize = [
+            filter_str = "".join(filter_complex) + f"concat=n={len(normalized_clips)}:v=1:a=1[outv][outa]"
+
+            # Concatenate videos
+            logger.info(f"Concatenating {len(normalized_clips)} clips into final video")
+            cmd_concat = [
                 "ffmpeg", "-y",
-                "-i", clip,
-                "-vf", "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2",
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-b:a", "192k",
-                "-preset", "ultrafast",
-                "-r", "30",
-                "-b:v", "5M",
-                "-maxrate", "5M",
-                "-bufsize", "10M",
-                "-pix_fmt", "yuv420p",
-                "-g", "30",
-                "-keyint_min", "30",
-                "-sc_threshold", "0",
-                "-profile:v", "high",
-                "-level", "4.0",
-                normalized_path
+                *inputs,
+                "-filter_complex", filter_str,
+                "-map", "[outv]",
+                "-map", "[outa]",
+                *ENCODE_ARGS,
+                "-movflags", "+faststart",
+                output_path
             ]
+            
             try:
-                subprocess.run(cmd_normalize, check=True, capture_output=True, text=True)
-                normalized_clips.append(normalized_path)
+                subprocess.run(cmd_concat, check=True, capture_output=True, text=True)
             except subprocess.CalledProcessError as e:
-                logger.error(f"Error normalizing {clip}: {e.stderr}")
+                logger.error(f"Concatenation error: {e.stderr}")
                 raise
-
-        # Build concatenation filter
-        filter_complex = []
-        inputs = []
-        for i, clip in enumerate(normalized_clips):
-            inputs.extend(["-i", clip])
-            filter_complex.append(f"[{i}:v][{i}:a]")
-        
-        filter_str = "".join(filter_complex) + f"concat=n={len(normalized_clips)}:v=1:a=1[outv][outa]"
-
-        # Concatenate videos
-        logger.info(f"Concatenating {len(normalized_clips)} clips into final video")
-        cmd_concat = [
-            "ffmpeg", "-y",
-            *inputs,
-            "-filter_complex", filter_str,
-            "-map", "[outv]",
-            "-map", "[outa]",
-            "-c:v", "libx264",
-            "-c:a", "aac",
-            "-b:a", "192k",
-            "-preset", "ultrafast",
-            "-b:v", "5M",
-            "-maxrate", "5M",
-            "-bufsize", "10M",
-            "-pix_fmt", "yuv420p",
-            "-r", "30",
-            "-g", "30",
-            "-keyint_min", "30",
-            "-sc_threshold", "0",
-            "-profile:v", "high",
-            "-level", "4.0",
-            "-movflags", "+faststart",
-            output_path
-        ]
-        
-        try:
-            subprocess.run(cmd_concat, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Concatenation error: {e.stderr}")
-            raise
+        finally:
+            if workspace:
+                for path in normalized_clips:
+                    workspace.discard(path)
 
         # Verify output
         cmd_probe = [
@@ -167,4 +235,117 @@ def concatenate_videos(video_paths: List[str], output_path: str) -> str:
         logger.info(f"Duration: {final_duration:.2f}s")
         logger.info(f"Streams: {', '.join(stream_types)}")
         
-        return output_path 
\ No newline at end of file
+        return output_path
+
+def concat_copy(video_paths: List[str], output_path: str) -> str:
+    """
+    Concatenate clips that share ENCODE_ARGS with the concat demuxer and stream copy.
+    Only one input is open at a time, so memory stays flat regardless of clip count.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    list_path = output_path + ".txt"
+    with open(list_path, "w") as f:
+        for path in video_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        logger.info(f"Concatenated {len(video_paths)} clips by stream copy into {output_path}")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Concat copy error: {e.stderr}")
+        raise
+    finally:
+        os.unlink(list_path)
+    return output_path
+
+class HLSPlaylist:
+    """
+    Progressive fMP4/HLS output: each finished scene is segmented and appended
+    to a media playlist that players can open while later scenes still render.
+    """
+
+    def __init__(self, out_dir: str, name: str = "playlist.m3u8", segment_seconds: int = HLS_SEGMENT_SECONDS):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, name)
+        self.segment_seconds = segment_seconds
+        self.scenes: List[Tuple[str, List[Tuple[float, str]]]] = []
+        self.finished = False
+        os.makedirs(out_dir, exist_ok=True)
+        self._write()
+
+    def append_scene(self, scene_path: str) -> str:
+        """Segment a scene encoded with ENCODE_ARGS (stream copy) and publish it in the playlist."""
+        index = len(self.scenes) + 1
+        prefix = f"scene{index}"
+        scene_playlist = os.path.join(self.out_dir, f"{prefix}.m3u8")
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", scene_path,
+            "-c", "copy",
+            "-f", "hls",
+            "-hls_time", str(self.segment_seconds),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4",
+            "-hls_fmp4_init_filename", f"{prefix}_init.mp4",
+            "-hls_segment_filename", os.path.join(self.out_dir, f"{prefix}_%03d.m4s"),
+            scene_playlist
+        ]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"HLS segmenting error for {scene_path}: {e.stderr}")
+            raise
+
+        segments: List[Tuple[float, str]] = []
+        duration = None
+        with open(scene_playlist) as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("#EXTINF:"):
+                    duration = float(line[len("#EXTINF:"):].rstrip(",").split(",")[0])
+                elif line and not line.startswith("#") and duration is not None:
+                    segments.append((duration, line))
+                    duration = None
+        os.unlink(scene_playlist)
+
+        self.scenes.append((f"{prefix}_init.mp4", segments))
+        self._write()
+        logger.info(f"Published scene {index} ({len(segments)} segments) to {self.path}")
+        return self.path
+
+    def finalize(self) -> str:
+        self.finished = True
+        self._write()
+        return self.path
+
+    def _write(self) -> None:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            f"#EXT-X-TARGETDURATION:{self.segment_seconds + 1}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+        ]
+        for i, (init, segments) in enumerate(self.scenes):
+            if i:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f'#EXT-X-MAP:URI="{init}"')
+            for duration, uri in segments:
+                lines.append(f"#EXTINF:{duration:.3f},")
+                lines.append(uri)
+        if self.finished:
+            lines.append("#EXT-X-ENDLIST")
+
+        # Write then rename so players never read a half-written playlist
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
@@ -23,4 +23,20 @@ class SearchQueryOutput(BaseModel):
     queries: List[str]  # List of search query strings
 
 class RankVideoOutput(BaseModel):
-    best_index: int  # zero‑based index of the single best clip
\ No newline at end of file
+    best_index: int  # zero‑based index of the single best clip
+
+# Normalized stock-footage search result, whatever provider it came from
+class StockClip(BaseModel):
+    provider: str
+    id: str
+    description: str
+    keywords: List[str] = []
+    categories: List[str] = []
+    duration: float
+    width: int = 0
+    height: int = 0
+    preview_url: str
+
+    @property
+    def resolution(self) -> str:
+        return f"{self.width}x{self.height}"
@@ -0,0 +1,116 @@
+"""
+Speculative prefetch of candidate stock clips while the LLM is still ranking them.
+
+As soon as search results arrive, the top few candidates by a cheap local
+score start range-limited downloads into the job workspace. When ranking
+commits to a winner the other transfers are cancelled and the winner's file
+is handed to the media stage. A process-wide pool caps concurrent transfers,
+which bounds the bandwidth spent on speculation.
+"""
+
+import os
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional, Tuple
+from utils.env import load_env
+from utils.models import StockClip
+from utils.download import download_partial, KEYFRAME_MARGIN
+from utils.workspace import Workspace, estimate_media_bytes, QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+load_env()
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "3"))
+PREFETCH_MAX_TRANSFERS = int(os.getenv("PREFETCH_MAX_TRANSFERS", "6"))
+# Voice-over estimates can run short; fetch a bit more so the prefetch is usually long enough
+DURATION_SAFETY = 1.25
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_TRANSFERS, thread_name_prefix="prefetch")
+_WORD = re.compile(r"[a-z0-9]+")
+
+def cheap_score(candidate: StockClip, desc: str, min_duration: Optional[float] = None) -> float:
+    """Word overlap between the scene description and a candidate's description and keywords."""
+    wanted = set(_WORD.findall(desc.lower()))
+    if not wanted:
+        return 0.0
+    text = " ".join([candidate.description] + candidate.keywords)
+    have = set(_WORD.findall(text.lower()))
+    score = len(wanted & have) / len(wanted)
+    if min_duration and candidate.duration >= min_duration:
+        score += 0.1
+    return score
+
+class Prefetcher:
+    """Prefetches candidate clips for one sub-scene into a job workspace."""
+
+    def __init__(self, workspace: Workspace, name: str, duration: float, top_k: int = PREFETCH_TOP_K):
+        self.workspace = workspace
+        self.name = name
+        self.span = duration * DURATION_SAFETY
+        self.top_k = top_k
+        self._jobs: Dict[str, Tuple[Future, threading.Event, str]] = {}
+        self._lock = threading.Lock()
+        # Cancelled transfers may still be writing, so file names are never reused
+        self._seq = 0
+
+    def _fetch(self, url: str, path: str, cancel: threading.Event) -> str:
+        download_partial(url, path, self.span, cancel=cancel)
+        self.workspace.settle(path)
+        return path
+
+    def start(self, candidates: List[StockClip], desc: str, min_duration: Optional[float] = None) -> None:
+        """Cancel earlier speculation and start fetching the best-scoring new candidates."""
+        self.cancel_all()
+        if min_duration:
+            candidates = [c for c in candidates if c.duration >= min_duration]
+        ranked = sorted(candidates, key=lambda c: cheap_score(c, desc, min_duration), reverse=True)
+
+        with self._lock:
+            for candidate in ranked[:self.top_k]:
+                url = candidate.preview_url
+                if not url or url in self._jobs:
+                    continue
+                self._seq += 1
+                try:
+                    path = self.workspace.allocate(
+                        f"prefetch/{self.name}_{self._seq}.mp4",
+                        estimate_media_bytes(self.span + KEYFRAME_MARGIN),
+                        timeout=0
+                    )
+                except QuotaExceeded as e:
+                    # Speculation never waits for scratch space
+                    logger.info(f"Skipping prefetch, no scratch space: {str(e)}")
+                    break
+                cancel = threading.Event()
+                self._jobs[url] = (_executor.submit(self._fetch, url, path, cancel), cancel, path)
+        logger.info(f"Prefetching {len(self._jobs)} candidates for {self.name}")
+
+    def commit(self, url: Optional[str]) -> Optional[Tuple[str, float]]:
+        """
+        Cancel every candidate except `url` and wait for it.
+
+        Returns (path, seconds fetched) for the winner, or None if it was not prefetched or failed.
+        """
+        with self._lock:
+            winner = self._jobs.pop(url, None) if url else None
+        self.cancel_all()
+        if winner is None:
+            return None
+        future, _, path = winner
+        try:
+            return future.result(), self.span
+        except Exception as e:
+            logger.warning(f"Prefetch of {url} failed: {str(e)}")
+            self.workspace.discard(path)
+            return None
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            jobs, self._jobs = self._jobs, {}
+        for future, cancel, path in jobs.values():
+            cancel.set()
+            future.cancel()
+            # Delete once the transfer has actually stopped, without blocking the caller
+            future.add_done_callback(lambda _, path=path: self.workspace.discard(path))
@@ -1,9 +1,9 @@
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
+from langchain_core.prompts import PromptTemplate
+from utils.structured_output import TolerantPydanticParser
 from utils.models import ScriptOutput, SearchTermsOutput, RankVideoOutput, SearchQueryOutput
 
 # 1) Script generation prompt
-script_parser = PydanticOutputParser(pydantic_object=ScriptOutput)
+script_parser = TolerantPydanticParser(pydantic_object=ScriptOutput)
 script_prompt = PromptTemplate(
     template="""
 You are an expert ad scriptwriter.
@@ -22,7 +22,7 @@ You do **not** need to specify durations — we will derive them automatically f
 
 ### Output format
 
-Return JSON using this structure(Don't give me the markdown format with the ```JSON```):
+Return only JSON using this structure:
 
 {{
   "scenes": [
@@ -53,17 +53,14 @@ Return JSON using this structure(Don't give me the markdown format with the ```J
 4. Do not exceed 3 seconds of pause duration.
 5. DO NOT use SSML tags directly in the dialogue. Instead, use the [PAUSE:X.Xs] format.
 
-{format_instructions}
-
 Client's campaign idea: {user_prompt}
 """,
-    input_variables=["user_prompt"],
-    partial_variables={"format_instructions": script_parser.get_format_instructions()}
+    input_variables=["user_prompt"]
 )
 
 # ——— VIDEO FINDER ———
 # 1) Search terms prompt
-search_terms_parser = PydanticOutputParser(pydantic_object=SearchQueryOutput)
+search_terms_parser = TolerantPydanticParser(pydantic_object=SearchQueryOutput)
 search_terms_prompt  = PromptTemplate(
     template="""
 Generate a single, concise (3–5 word) Shutterstock search query that best matches this scene:
@@ -79,7 +76,7 @@ Focus on the most distinctive visual element and one contextual cue.
 )
 
 # 2) Ranking prompt
-rank_video_parser = PydanticOutputParser(pydantic_object=RankVideoOutput)
+rank_video_parser = TolerantPydanticParser(pydantic_object=RankVideoOutput)
 rank_videos_prompt = PromptTemplate(
     template="""
 You are given a scene description and a list of candidate video options in JSON format.
@@ -0,0 +1,46 @@
+"""
+Token-bucket rate limiting shared by every caller in the process.
+"""
+
+import time
+import asyncio
+import threading
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> float:
+        """Take a token if available; otherwise return the seconds to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        """Take a token without waiting; False when the bucket is empty."""
+        return not self._try_acquire()
+
+    def acquire(self) -> None:
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
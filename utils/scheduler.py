@@ -0,0 +1,142 @@
+"""
+Global scheduler for bulk campaign jobs.
+
+All bulk items in the process share one worker pool, so concurrent bulk
+requests are interleaved instead of each spinning up their own workers. LLM
+quota, caches and the DB pool are shared through the modules they live in.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from utils.env import load_env
+from utils.lazy import lazy
+
+logger = logging.getLogger(__name__)
+
+load_env()
+
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "50"))
+# Longest a finished script waits for its batch to fill before being stored anyway
+DB_FLUSH_SECONDS = float(os.getenv("DB_FLUSH_SECONDS", "5"))
+
+def parse_jsonl(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse JSONL campaign ideas; malformed lines become items carrying an "error"."""
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"error": f"Invalid JSON on line {lineno}: {str(e)}"}
+            continue
+        if not isinstance(item, dict) or not str(item.get("campaign_idea", "")).strip():
+            yield {"error": f"Line {lineno} has no campaign_idea"}
+            continue
+        yield item
+
+class BulkScheduler:
+    """Runs campaign ideas through the script pipeline on a shared, bounded worker pool."""
+
+    def __init__(self, workers: int = BULK_CONCURRENCY, batch_size: int = DB_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk")
+
+    def _generate(self, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from graph.nodes.script_generator import generate_script_node
+        return generate_script_node({"user_prompt": item["campaign_idea"]})["script"]["scenes"]
+
+    def _flush(self, batch: List[Tuple[str, list]], results: List[Dict[str, Any]]) -> None:
+        """Store a batch and mark its results; a failed insert is reported on every affected item."""
+        from utils.db_config import store_scripts_in_db
+        if batch and not store_scripts_in_db(batch):
+            logger.error(f"Failed to store a batch of {len(batch)} scripts")
+            for result in results:
+                result["error"] = "Script was generated but could not be stored"
+        batch.clear()
+
+    def run(self, items: Iterable[Dict[str, Any]], store: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Yield one result per input item, in completion order.
+
+        Each result carries the input "index" (and "id" if given) plus either
+        "script" or "error". At most 2x the worker count of items are in
+        flight per call, so huge inputs are streamed rather than buffered.
+        With `store`, a script is only yielded once its batch has been written
+        (at most DB_FLUSH_SECONDS later); if the write fails the result also
+        carries an "error". Closing the generator early still stores every
+        script generated so far.
+        """
+        pending: Dict[Future, Tuple[int, Dict[str, Any]]] = {}
+        batch: List[Tuple[str, list]] = []
+        unstored: List[Dict[str, Any]] = []
+        batch_started = 0.0
+        source = enumerate(items)
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < self.workers * 2:
+                    try:
+                        index, item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if "error" in item:
+                        yield {"index": index, "error": item["error"]}
+                        continue
+                    pending[self._executor.submit(self._generate, item)] = (index, item)
+
+                if not pending:
+                    break
+
+                timeout = max(batch_started + DB_FLUSH_SECONDS - time.monotonic(), 0.0) if batch else None
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                ready: List[Dict[str, Any]] = []
+                for fut in done:
+                    index, item = pending.pop(fut)
+                    result: Dict[str, Any] = {"index": index, "campaign_idea": item["campaign_idea"]}
+                    if "id" in item:
+                        result["id"] = item["id"]
+                    try:
+                        result["script"] = fut.result()
+                    except Exception as e:
+                        logger.warning(f"Bulk item {index} failed: {str(e)}")
+                        result["error"] = str(e)
+                        ready.append(result)
+                        continue
+                    if not store:
+                        ready.append(result)
+                        continue
+                    if not batch:
+                        batch_started = time.monotonic()
+                    batch.append((item["campaign_idea"], result["script"]))
+                    unstored.append(result)
+
+                if batch and (len(batch) >= self.batch_size or time.monotonic() - batch_started >= DB_FLUSH_SECONDS):
+                    self._flush(batch, unstored)
+                    ready.extend(unstored)
+                    unstored = []
+                yield from ready
+
+            if batch:
+                self._flush(batch, unstored)
+                yield from unstored
+                unstored = []
+        finally:
+            # Reached early when the consumer goes away: keep what was generated, skip what was not started
+            for fut in pending:
+                fut.cancel()
+            if batch:
+                self._flush(batch, unstored)
+
+@lazy
+def get_scheduler() -> BulkScheduler:
+    """The process-wide bulk scheduler."""
+    return BulkScheduler()
@@ -0,0 +1,279 @@
+"""
+Pluggable stock-footage providers behind a common interface.
+
+Each provider turns its own API response into normalized StockClip results.
+ProviderPool queries providers concurrently, merges their candidates, stops
+waiting for a slow provider once the others have answered, backs off from
+rate-limited ones, and tracks per-provider latency and hit rate so the
+best providers are asked first and weak ones only as a fallback.
+"""
+
+import os
+import time
+import logging
+import threading
+import requests
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from typing import Deque, Dict, List, Optional, Tuple
+from utils.env import load_env
+from utils.lazy import lazy
+from utils.latency import LatencyTracker, WINDOW_SIZE, MIN_SAMPLES
+from utils.models import StockClip
+
+logger = logging.getLogger(__name__)
+
+load_env()
+
+DEFAULT_SOFT_TIMEOUT = 5.0   # seconds to wait for every provider before going with what arrived
+HARD_TIMEOUT = 30.0          # seconds to wait for any result at all
+MIN_HIT_RATE = 0.2           # below this a provider is only queried when the others find nothing
+DEFAULT_COOLDOWN = 60.0      # seconds to skip a rate-limited provider without Retry-After
+REQUEST_TIMEOUT = 15.0
+
+class ProviderRateLimited(Exception):
+    def __init__(self, provider: str, retry_after: Optional[float] = None):
+        super().__init__(f"{provider} is rate limited")
+        self.retry_after = retry_after
+
+# Failures that mean "no answer this time"; anything else (bad credentials, bad request) is a real error
+TRANSIENT_ERRORS = (ProviderRateLimited, requests.Timeout, requests.ConnectionError)
+
+class StockProvider(ABC):
+    """A stock-footage search API returning normalized clips."""
+
+    name: str = "provider"
+
+    @abstractmethod
+    def search(self, query: str, per_page: int = 10) -> List[StockClip]:
+        """Search for clips; raise ProviderRateLimited when the API says so."""
+
+def _get_json(provider: str, url: str, **kwargs) -> Dict:
+    resp = requests.get(url, timeout=REQUEST_TIMEOUT, **kwargs)
+    if resp.status_code == 429:
+        retry_after = resp.headers.get("Retry-After")
+        raise ProviderRateLimited(provider, float(retry_after) if retry_after and retry_after.isdigit() else None)
+    resp.raise_for_status()
+    return resp.json()
+
+class ShutterstockProvider(StockProvider):
+    name = "shutterstock"
+
+    def __init__(self, token: Optional[str] = None):
+        self.token = token or os.getenv("SHUTTERSTOCK_TOKEN")
+
+    def search(self, query: str, per_page: int = 10) -> List[StockClip]:
+        data = _get_json(
+            self.name,
+            "https://api.shutterstock.com/v2/videos/search",
+            params={"query": query, "per_page": per_page, "view": "full"},
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/x-www-form-urlencoded"
+            }
+        )
+        clips = []
+        for item in data.get("data", []):
+            preview = item.get("assets", {}).get("preview_mp4", {})
+            if not preview.get("url"):
+                continue
+            clips.append(StockClip(
+                provider=self.name,
+                id=str(item["id"]),
+                description=item.get("description", ""),
+                keywords=item.get("keywords", []),
+                categories=[c["name"] for c in item.get("categories", [])],
+                duration=float(item.get("duration", 0)),
+                width=int(preview.get("width", 0)),
+                height=int(preview.get("height", 0)),
+                preview_url=preview["url"],
+            ))
+        return clips
+
+class PixabayProvider(StockProvider):
+    name = "pixabay"
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("PIXABAY_API_KEY")
+
+    def search(self, query: str, per_page: int = 10) -> List[StockClip]:
+        data = _get_json(
+            self.name,
+            "https://pixabay.com/api/videos/",
+            params={"key": self.api_key, "q": query, "per_page": max(per_page, 3)}
+        )
+        clips = []
+        for hit in data.get("hits", [])[:per_page]:
+            files = [f for f in hit.get("videos", {}).values() if f.get("url")]
+            if not files:
+                continue
+            best = max(files, key=lambda f: f.get("width", 0) * f.get("height", 0))
+            tags = [t.strip() for t in hit.get("tags", "").split(",") if t.strip()]
+            clips.append(StockClip(
+                provider=self.name,
+                id=str(hit["id"]),
+                description=", ".join(tags),
+                keywords=tags,
+                duration=float(hit.get("duration", 0)),
+                width=int(best.get("width", 0)),
+                height=int(best.get("height", 0)),
+                preview_url=best["url"],
+            ))
+        return clips
+
+def interleave_clips(result_lists: List[List[StockClip]]) -> List[StockClip]:
+    """Merge result lists round-robin, best hits first, keeping the first copy of each clip."""
+    merged: Dict[Tuple[str, str], StockClip] = {}
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for clips in result_lists:
+            if rank < len(clips):
+                merged.setdefault((clips[rank].provider, clips[rank].id), clips[rank])
+    return list(merged.values())
+
+class ProviderPool:
+    """Races several providers per query and learns which ones are worth asking."""
+
+    def __init__(
+        self,
+        providers: List[StockProvider],
+        soft_timeout: float = DEFAULT_SOFT_TIMEOUT,
+        hard_timeout: float = HARD_TIMEOUT,
+    ):
+        if not providers:
+            raise ValueError("ProviderPool needs at least one provider")
+        self.providers = providers
+        self.soft_timeout = soft_timeout
+        self.hard_timeout = hard_timeout
+        self.tracker = LatencyTracker()
+        self._hits: Dict[str, Deque[bool]] = {p.name: deque(maxlen=WINDOW_SIZE) for p in providers}
+        self._cooldown_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(providers), thread_name_prefix="stock")
+
+    def hit_rate(self, name: str) -> Optional[float]:
+        with self._lock:
+            hits = list(self._hits[name])
+        if len(hits) < MIN_SAMPLES:
+            return None
+        return hits.count(True) / len(hits)
+
+    def _score(self, name: str) -> float:
+        """Expected seconds per useful result; lower is better. Unmeasured providers score 0."""
+        latency = self.tracker.expected_latency(name)
+        hit_rate = self.hit_rate(name)
+        if latency is None or hit_rate is None:
+            return 0.0
+        return latency / max(hit_rate, 0.05)
+
+    def ranked(self) -> List[StockProvider]:
+        now = time.monotonic()
+        with self._lock:
+            active = [p for p in self.providers if self._cooldown_until.get(p.name, 0) <= now]
+        return sorted(active, key=lambda p: self._score(p.name))
+
+    def _call(self, provider: StockProvider, query: str, per_page: int) -> List[StockClip]:
+        start = time.monotonic()
+        try:
+            clips = provider.search(query, per_page)
+        except ProviderRateLimited as e:
+            cooldown = e.retry_after or DEFAULT_COOLDOWN
+            with self._lock:
+                self._cooldown_until[provider.name] = time.monotonic() + cooldown
+            logger.warning(f"{provider.name} rate limited; skipping it for {cooldown:.0f}s")
+            self.tracker.record(provider.name, time.monotonic() - start, ok=False)
+            raise
+        except Exception:
+            self.tracker.record(provider.name, time.monotonic() - start, ok=False)
+            raise
+        self.tracker.record(provider.name, time.monotonic() - start, ok=True)
+        with self._lock:
+            self._hits[provider.name].append(bool(clips))
+        return clips
+
+    def _soft_deadline(self, providers: List[StockProvider]) -> float:
+        p95s = [self.tracker.percentile(p.name, 0.95) for p in providers]
+        known = [p for p in p95s if p is not None]
+        return min(max(known), self.soft_timeout) if known else self.soft_timeout
+
+    def _race(
+        self, providers: List[StockProvider], query: str, per_page: int
+    ) -> Tuple[Dict[str, List[StockClip]], Dict[str, Exception]]:
+        futures: Dict[Future, StockProvider] = {
+            self._executor.submit(self._call, p, query, per_page): p for p in providers
+        }
+        results: Dict[str, List[StockClip]] = {}
+        errors: Dict[str, Exception] = {}
+        start = time.monotonic()
+        soft = self._soft_deadline(providers)
+        pending = set(futures)
+
+        while pending:
+            elapsed = time.monotonic() - start
+            # Past the soft deadline, any result is good enough; slow providers keep running in the background
+            if elapsed >= soft and any(results.values()):
+                break
+            if elapsed >= self.hard_timeout:
+                break
+            limit = soft if elapsed < soft else self.hard_timeout
+            done, pending = wait(pending, timeout=limit - elapsed, return_when=FIRST_COMPLETED)
+            for fut in done:
+                provider = futures[fut]
+                try:
+                    results[provider.name] = fut.result()
+                except TRANSIENT_ERRORS as e:
+                    logger.warning(f"{provider.name} search failed for {query!r}: {str(e)}")
+                except Exception as e:
+                    logger.error(f"{provider.name} search failed for {query!r}: {str(e)}")
+                    errors[provider.name] = e
+
+        for fut in pending:
+            logger.info(f"Not waiting for slow provider {futures[fut].name} on {query!r}")
+        return results, errors
+
+    def search(self, query: str, per_page: int = 10) -> List[StockClip]:
+        """
+        Query providers concurrently and return their clips merged, best provider first.
+
+        Slow, rate-limited and unreachable providers count as empty; if no provider
+        answered and one failed otherwise, that error is raised.
+        """
+        ranked = self.ranked()
+        if not ranked:
+            # Everything is cooling down; try anyway rather than return nothing
+            ranked = list(self.providers)
+        hit_rates = {p.name: self.hit_rate(p.name) for p in ranked}
+        # Unmeasured providers stay primary until they have a track record
+        primary = [p for p in ranked if hit_rates[p.name] is None or hit_rates[p.name] >= MIN_HIT_RATE] or ranked
+        fallback = [p for p in ranked if p not in primary]
+
+        results, errors = self._race(primary, query, per_page)
+        if not any(results.values()) and fallback:
+            logger.info(f"No results from {[p.name for p in primary]}; falling back to {[p.name for p in fallback]}")
+            more, more_errors = self._race(fallback, query, per_page)
+            results.update(more)
+            errors.update(more_errors)
+        if errors and not results:
+            # Nobody answered and someone failed for real (e.g. a bad token): that is not "no footage"
+            raise next(iter(errors.values()))
+
+        # In provider rank order so each provider's best hits reach the ranking window
+        return interleave_clips([results[p.name] for p in ranked if results.get(p.name)])
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        snapshot = self.tracker.snapshot()
+        for p in self.providers:
+            snapshot.setdefault(p.name, {})["hit_rate"] = self.hit_rate(p.name)
+        return snapshot
+
+@lazy
+def get_provider_pool() -> ProviderPool:
+    """The process-wide pool over every provider with credentials configured."""
+    providers: List[StockProvider] = []
+    if os.getenv("SHUTTERSTOCK_TOKEN"):
+        providers.append(ShutterstockProvider())
+    if os.getenv("PIXABAY_API_KEY"):
+        providers.append(PixabayProvider())
+    if not providers:
+        raise RuntimeError("No stock providers configured; set SHUTTERSTOCK_TOKEN and/or PIXABAY_API_KEY")
+    return ProviderPool(providers)
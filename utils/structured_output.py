@@ -0,0 +1,131 @@
+"""
+Compact structured output: minimal schema hints, a tolerant JSON repair parser and parse counters.
+"""
+
+import re
+import json
+import types
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Type, Union, get_args, get_origin
+from pydantic import BaseModel, ValidationError
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.runnables import Runnable
+
+logger = logging.getLogger(__name__)
+
+# Ask the provider for a bare JSON object (Groq/OpenAI-compatible JSON mode)
+JSON_MODE: Dict[str, Any] = {"model_kwargs": {"response_format": {"type": "json_object"}}}
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S | re.I)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+def parse_stats() -> Dict[str, int]:
+    """Return parse outcome counters keyed as `<Model>.<ok|repaired|failed>`."""
+    with _stats_lock:
+        return dict(_stats)
+
+def _shape(annotation: Any) -> Any:
+    origin = get_origin(annotation)
+    if origin in (list, List):
+        return [_shape(get_args(annotation)[0])]
+    if origin in (Union, types.UnionType):
+        return _shape(next(a for a in get_args(annotation) if a is not type(None)))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {name: _shape(field.annotation) for name, field in annotation.model_fields.items()}
+    return {str: "string", int: "int", float: "number", bool: "bool"}.get(annotation, "any")
+
+def compact_schema(model: Type[BaseModel]) -> str:
+    """Render a model as a one-line JSON shape, e.g. {"queries": ["string"]}."""
+    return json.dumps(_shape(model), ensure_ascii=False)
+
+def repair_json(text: str) -> str:
+    """
+    Salvage a JSON value from near-valid LLM output.
+
+    Strips markdown fences and surrounding prose, closes truncated strings,
+    objects and arrays, and drops trailing commas.
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text.strip()
+    start = min(starts)
+
+    stack: List[str] = []
+    in_string = escaped = False
+    end = len(text)
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]" and stack:
+            stack.pop()
+            if not stack:
+                end = i + 1
+                break
+
+    candidate = text[start:end]
+    if stack:
+        # Output was cut off mid-value
+        candidate = candidate + ('"' if in_string else "") + "".join(reversed(stack))
+    return _TRAILING_COMMA.sub(r"\1", candidate)
+
+class TolerantPydanticParser(BaseOutputParser[BaseModel]):
+    """Pydantic output parser that repairs near-valid JSON before giving up."""
+
+    pydantic_object: Type[BaseModel]
+
+    def parse(self, text: str) -> BaseModel:
+        name = self.pydantic_object.__name__
+        try:
+            result = self.pydantic_object.model_validate_json(text)
+            _count(f"{name}.ok")
+            return result
+        except ValidationError:
+            pass
+        try:
+            result = self.pydantic_object.model_validate_json(repair_json(text))
+            _count(f"{name}.repaired")
+            logger.info(f"Repaired malformed {name} output")
+            return result
+        except ValidationError as e:
+            _count(f"{name}.failed")
+            logger.warning(f"Could not parse {name} output: {str(e)}")
+            raise OutputParserException(f"Failed to parse {name}: {str(e)}", llm_output=text) from e
+
+    def get_format_instructions(self) -> str:
+        return f"Return only a JSON object with this shape: {compact_schema(self.pydantic_object)}"
+
+    @property
+    def _type(self) -> str:
+        return "tolerant_pydantic"
+
+def structured_chain(prompt: Runnable, llm: Runnable, parser: BaseOutputParser, retries: int = 1) -> Runnable:
+    """Compose prompt | llm | parser, regenerating only when repair could not salvage the output."""
+    return (prompt | llm | parser).with_retry(
+        retry_if_exception_type=(OutputParserException,),
+        stop_after_attempt=retries + 1,
+    )
@@ -1,15 +1,28 @@
 import os
-import re
+import shutil
+import hashlib
+import tempfile
 import logging
-from elevenlabs.client import ElevenLabs
-from dotenv import load_dotenv
+from utils.env import load_env
+from utils.duration import PAUSE_PATTERN
+from utils.lazy import lazy
 
 logger = logging.getLogger(__name__)
 
 # Load environment variables
-load_dotenv()
-client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+load_env()
 VOICE_ID = os.getenv("ELEVEN_VOICE_ID")
+MODEL_ID = "eleven_multilingual_v2"
+# Rendered clips keyed by voice, model and text; shared by all jobs on this host
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("outputs", "tts_cache"))
+# Least recently used clips are evicted once the cache grows past this
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+@lazy
+def get_client():
+    """ElevenLabs client, built on first use."""
+    from elevenlabs.client import ElevenLabs
+    return ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
 
 def convert_pause_markers_to_ssml(text: str) -> str:
     """Convert [PAUSE:X.Xs] markers to SSML break tags."""
@@ -17,27 +30,76 @@ def convert_pause_markers_to_ssml(text: str) -> str:
         duration = match.group(1)
         return f'<break time="{duration}s"/>'
     
-    return re.sub(r'\[PAUSE:(\d+\.?\d*)s\]', replace_pause, text)
+    return PAUSE_PATTERN.sub(replace_pause, text)
+
+def _cache_path(text: str) -> str:
+    digest = hashlib.sha256(f"{VOICE_ID}|{MODEL_ID}|{text}".encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{digest}.mp3")
+
+def _evict_cache(max_bytes: int = TTS_CACHE_MAX_BYTES) -> None:
+    """Delete the least recently used cached clips until the cache fits in `max_bytes`."""
+    entries = []
+    with os.scandir(TTS_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".mp3"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
 
 def render_tts(text: str, out_path: str) -> None:
     """Generate TTS audio using ElevenLabs API."""
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    cached = _cache_path(text)
+    try:
+        shutil.copyfile(cached, out_path)
+    except FileNotFoundError:
+        pass
+    else:
+        try:
+            # Mark as recently used so eviction keeps it
+            os.utime(cached)
+        except OSError:
+            pass
+        logger.info(f"TTS cache hit for text: {text[:40]}...")
+        return
+
     logger.info(f"Generating TTS for text: {text[:40]}...")
     try:
         # Convert pause markers to SSML
         ssml_text = convert_pause_markers_to_ssml(text)
         
-        gen = client.text_to_speech.convert(
+        gen = get_client().text_to_speech.convert(
             text=ssml_text,
             voice_id=VOICE_ID,
-            model_id="eleven_multilingual_v2",
+            model_id=MODEL_ID,
             output_format="mp3_44100_128",
             voice_settings={"speed": 1.0, "stability": 0.35, "similarity_boost": 0.75}
         )
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
         with open(out_path, "wb") as f:
             for chunk in gen:
                 f.write(chunk)
         logger.info(f"TTS audio saved to {out_path}")
+
+        try:
+            os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=TTS_CACHE_DIR, suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(out_path, tmp)
+            os.replace(tmp, cached)
+            _evict_cache()
+        except OSError as e:
+            logger.warning(f"Could not cache TTS audio: {str(e)}")
     except Exception as e:
         logger.error(f"Error generating TTS: {str(e)}")
         raise 
\ No newline at end of file
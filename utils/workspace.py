@@ -0,0 +1,241 @@
+"""
+Per-job scratch workspaces with optional RAM-backed storage and disk quotas.
+
+Each job gets its own scratch directory (on tmpfs while a full job quota of
+it can still be reserved, otherwise on disk) for
+short-lived intermediates and its own output directory on disk for artifacts
+that outlive the job. Intermediates are allocated against per-job and global
+quotas: a job over its own quota fails fast, while jobs that would push the
+host over the global quota wait until others free space.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Any, Dict, Optional
+from utils.env import load_env
+from utils.lazy import lazy
+
+logger = logging.getLogger(__name__)
+
+load_env()
+
+MB = 1024 * 1024
+
+SCRATCH_ROOT = os.getenv("SCRATCH_ROOT", os.path.join("outputs", "scratch"))
+OUTPUT_ROOT = os.getenv("JOB_OUTPUT_ROOT", os.path.join("outputs", "jobs"))
+TMPFS_ROOT = os.getenv("SCRATCH_TMPFS_ROOT", "/dev/shm")
+JOB_QUOTA_BYTES = int(os.getenv("SCRATCH_JOB_QUOTA_MB", "2048")) * MB
+GLOBAL_QUOTA_BYTES = int(os.getenv("SCRATCH_GLOBAL_QUOTA_MB", "8192")) * MB
+# RAM handed to tmpfs scratch across all jobs; unset means half the tmpfs size
+TMPFS_QUOTA_BYTES = int(os.getenv("SCRATCH_TMPFS_QUOTA_MB")) * MB if os.getenv("SCRATCH_TMPFS_QUOTA_MB") else None
+ALLOCATE_TIMEOUT = 300.0
+
+# Rough upper bound for intermediates: the 5M video + 192k audio of ENCODE_ARGS, plus headroom
+DEFAULT_BITRATE = 6_000_000
+
+class QuotaExceeded(Exception):
+    """Raised when an allocation can never fit, or did not fit before the timeout."""
+
+def estimate_media_bytes(seconds: float, bits_per_second: int = DEFAULT_BITRATE) -> int:
+    """Rough size of a media file of the given duration."""
+    return int(seconds * bits_per_second / 8) + MB
+
+class Workspace:
+    """An isolated scratch + output directory pair for one job."""
+
+    def __init__(self, manager: "WorkspaceManager", job_id: str, scratch_dir: str, output_dir: str, on_tmpfs: bool):
+        self.manager = manager
+        self.job_id = job_id
+        self.scratch_dir = scratch_dir
+        self.output_dir = output_dir
+        self.on_tmpfs = on_tmpfs
+        self.used_bytes = 0
+        self.peak_bytes = 0
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def path(self, name: str) -> str:
+        """Path for an unaccounted scratch file (small or immediately deleted)."""
+        path = os.path.join(self.scratch_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def output_path(self, name: str) -> str:
+        """Path for an artifact that is kept after the job finishes."""
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def allocate(self, name: str, estimate_bytes: int, timeout: float = ALLOCATE_TIMEOUT) -> str:
+        """Reserve quota for a scratch file, waiting for global space if needed, and return its path."""
+        path = self.path(name)
+        with self._lock:
+            if self.used_bytes + estimate_bytes > self.manager.job_quota:
+                raise QuotaExceeded(
+                    f"Job {self.job_id} needs {estimate_bytes} bytes for {name} "
+                    f"but has {self.manager.job_quota - self.used_bytes} left"
+                )
+        self.manager.reserve(estimate_bytes, timeout)
+        delta = self._adjust(path, estimate_bytes)
+        # Re-allocating a path replaces its previous reservation
+        self.manager.adjust(delta - estimate_bytes)
+        return path
+
+    def settle(self, path: str) -> int:
+        """Replace the reservation for `path` with its actual size once written."""
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        delta = self._adjust(path, size)
+        self.manager.adjust(delta)
+        return size
+
+    def discard(self, path: str) -> None:
+        """Eagerly delete a consumed intermediate and release its quota."""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not delete intermediate {path}: {str(e)}")
+            return
+        delta = self._adjust(path, 0)
+        self.manager.adjust(delta)
+
+    def _adjust(self, path: str, size: int) -> int:
+        with self._lock:
+            if self._closed:
+                # A background transfer finishing after close must not re-take quota
+                return 0
+            delta = size - self._sizes.get(path, 0)
+            if size:
+                self._sizes[path] = size
+            else:
+                self._sizes.pop(path, None)
+            self.used_bytes += delta
+            self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+            return delta
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "scratch_dir": self.scratch_dir,
+            "output_dir": self.output_dir,
+            "on_tmpfs": self.on_tmpfs,
+            "peak_scratch_bytes": self.peak_bytes,
+        }
+
+    def close(self) -> None:
+        """Delete the scratch directory and release all remaining quota."""
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+            released, self.used_bytes = self.used_bytes, 0
+            self._sizes.clear()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+        self.manager.adjust(-released)
+        if self.on_tmpfs:
+            self.manager.release_tmpfs()
+        logger.info(
+            f"Workspace {self.job_id} closed; peak scratch usage "
+            f"{self.peak_bytes / MB:.1f} MB ({'tmpfs' if self.on_tmpfs else 'disk'})"
+        )
+
+class WorkspaceManager:
+    """Hands out per-job workspaces and enforces the global scratch quota."""
+
+    def __init__(
+        self,
+        scratch_root: str = SCRATCH_ROOT,
+        output_root: str = OUTPUT_ROOT,
+        tmpfs_root: Optional[str] = TMPFS_ROOT,
+        job_quota: int = JOB_QUOTA_BYTES,
+        global_quota: int = GLOBAL_QUOTA_BYTES,
+        tmpfs_quota: Optional[int] = TMPFS_QUOTA_BYTES,
+    ):
+        self.scratch_root = scratch_root
+        self.output_root = output_root
+        self.tmpfs_root = tmpfs_root
+        self.job_quota = job_quota
+        self.global_quota = global_quota
+        self.tmpfs_quota = tmpfs_quota
+        self.used_bytes = 0
+        self.tmpfs_reserved = 0
+        self._cond = threading.Condition()
+
+    def _reserve_tmpfs(self) -> bool:
+        """
+        Reserve a full job quota of tmpfs for a new job, or return False to use disk.
+
+        Every tmpfs job holds its reservation until it closes, so concurrent jobs
+        can never write more to tmpfs than it holds, whatever the global quota.
+        """
+        if not self.tmpfs_root or not os.path.isdir(self.tmpfs_root):
+            return False
+        try:
+            usage = shutil.disk_usage(self.tmpfs_root)
+        except OSError:
+            return False
+        limit = self.tmpfs_quota if self.tmpfs_quota is not None else usage.total // 2
+        with self._cond:
+            # Free space already excludes what open tmpfs jobs wrote, but not what they may still write
+            if self.tmpfs_reserved + self.job_quota > limit or usage.free < self.job_quota:
+                return False
+            self.tmpfs_reserved += self.job_quota
+            return True
+
+    def release_tmpfs(self) -> None:
+        with self._cond:
+            self.tmpfs_reserved -= self.job_quota
+
+    def job(self, job_id: Optional[str] = None, use_tmpfs: bool = True) -> Workspace:
+        """Create an isolated workspace; scratch goes to tmpfs when a full job quota of it can be reserved."""
+        job_id = job_id or uuid.uuid4().hex
+        on_tmpfs = use_tmpfs and self._reserve_tmpfs()
+        root = os.path.join(self.tmpfs_root, "video-app") if on_tmpfs else self.scratch_root
+        # A unique suffix keeps retries of the same job id from sharing scratch space
+        scratch_dir = os.path.join(root, f"{job_id}-{uuid.uuid4().hex[:8]}")
+        output_dir = os.path.join(self.output_root, job_id)
+        try:
+            os.makedirs(scratch_dir)
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError:
+            if on_tmpfs:
+                self.release_tmpfs()
+            raise
+        logger.info(f"Workspace {job_id}: scratch {scratch_dir}, outputs {output_dir}")
+        return Workspace(self, job_id, scratch_dir, output_dir, on_tmpfs)
+
+    def reserve(self, nbytes: int, timeout: float = ALLOCATE_TIMEOUT) -> None:
+        """Block until `nbytes` fit under the global quota (backpressure across jobs)."""
+        if nbytes > self.global_quota:
+            raise QuotaExceeded(f"{nbytes} bytes exceeds the global scratch quota of {self.global_quota}")
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.used_bytes + nbytes > self.global_quota:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QuotaExceeded(f"Timed out waiting {timeout:.0f}s for {nbytes} bytes of scratch space")
+                self._cond.wait(remaining)
+            self.used_bytes += nbytes
+
+    def adjust(self, delta: int) -> None:
+        with self._cond:
+            self.used_bytes += delta
+            if delta < 0:
+                self._cond.notify_all()
+
+@lazy
+def get_workspace_manager() -> WorkspaceManager:
+    """The process-wide workspace manager."""
+    return WorkspaceManager()